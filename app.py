@@ -1,10 +1,24 @@
+import time
+_script_started = time.perf_counter()
+
+import io
+import os
+import tempfile
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
-from data_manager import DataManager
 from utils import validate_phone, calculate_financial_metrics
-from auth_manager import AuthManager
+from passengers import normalize_phone, passenger_cache
+from auth_manager import AuthManager, FEED_STATE_KEYS
+from report_cache import report_cache
+from database import get_pool_stats, DEFAULT_TRIP_CAPACITY
+from instrumentation import INSTRUMENTATION_ENABLED, SLOW_QUERY_MS, page_timer, timings
+from partitions import start_maintenance
+from period_views import period_refresher
+from write_behind import WRITE_BEHIND_ENABLED, write_queue
+from read_replica import replica_router
+
+# pandas, plotly, DataManager, the importer and the exporter are imported inside
+# the pages that use them so the login page loads without them
 
 # Page configuration
 st.set_page_config(
@@ -46,9 +60,37 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize managers
+# Initialize managers (each query opens a short-lived session from the shared pool)
 auth_manager = AuthManager()
-dm = DataManager()
+
+# Creates next months' journey and expense partitions in the background (Postgres with partitioning only)
+start_maintenance()
+# Keeps the weekly and monthly period views fresh; bulk imports ask for an early refresh
+period_refresher.start()
+if WRITE_BEHIND_ENABLED:
+    # Applies anything left in the journal by the previous run
+    write_queue.start()
+# Writes the heartbeat that tells report reads how far behind the read replica is (replica only)
+replica_router.start()
+
+if INSTRUMENTATION_ENABLED:
+    timings.record('startup', 'app.py module', (time.perf_counter() - _script_started) * 1000)
+
+def get_data_manager():
+    from data_manager import DataManager
+    return DataManager()
+
+def save_entry(dm, operation, **arguments):
+    """Run a DataManager write, or journal it for the background writer when write-behind is on"""
+    if WRITE_BEHIND_ENABLED:
+        write_queue.submit(operation, dm.current_owner_id(), **arguments)
+    else:
+        getattr(dm, operation)(**arguments)
+    reset_feeds()
+
+def show_pending_writes():
+    if WRITE_BEHIND_ENABLED and write_queue.pending():
+        st.caption(f"{write_queue.pending()} entries saved locally, waiting to be written to the database")
 
 def login_page():
     st.title("🚌 Transport Management System")
@@ -109,19 +151,58 @@ def main():
         st.rerun()
 
     # Navigation
-    page = st.sidebar.selectbox(
-        "Navigation",
-        ["🎫 Passenger Journey", "💰 Vehicle Expenses", "📊 Financial Reports"]
-    )
+    pages = ["🎫 Passenger Journey", "💰 Vehicle Expenses", "📊 Financial Reports", "📥 Import & Export"]
+    if st.session_state.get('is_admin'):
+        pages.append("🛠️ Admin")
+    page = st.sidebar.selectbox("Navigation", pages)
+
+    with page_timer(page):
+        if "🎫 Passenger Journey" in page:
+            passenger_journey_page()
+        elif "💰 Vehicle Expenses" in page:
+            vehicle_expenses_page()
+        elif "📥 Import & Export" in page:
+            import_export_page()
+        elif "🛠️ Admin" in page:
+            admin_page()
+        else:
+            financial_reports_page()
+
+def render_feed(feed_key, fetch_page, page_size, empty_message):
+    """Render a keyset-paginated feed with a "Load more" button"""
+    import pandas as pd
+
+    # Pages already loaded and the cursor for the next one; "Load more" fetches only that page.
+    # save_entry drops this state so the feed is re-anchored on the newest row after a write
+    state_key = f"{feed_key}_pages"
+    pending = write_queue.pending() if WRITE_BEHIND_ENABLED else 0
+    state = st.session_state.get(state_key)
+    if state is None or state['pending'] != pending:
+        # Journaled writes landing in the database also move the feed's first page
+        page, next_cursor = fetch_page(limit=page_size, cursor=None)
+        state = st.session_state[state_key] = {'pages': [page], 'next_cursor': next_cursor, 'pending': pending}
+
+    rows = pd.concat(state['pages'], ignore_index=True)
+    if rows.empty:
+        st.info(empty_message)
+        return
 
-    if "🎫 Passenger Journey" in page:
-        passenger_journey_page()
-    elif "💰 Vehicle Expenses" in page:
-        vehicle_expenses_page()
-    else:
-        financial_reports_page()
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+    if state['next_cursor'] is not None and st.button("Load more", key=f"{feed_key}_load_more"):
+        page, state['next_cursor'] = fetch_page(limit=page_size, cursor=state['next_cursor'])
+        state['pages'].append(page)
+        st.rerun()
+
+def reset_feeds():
+    """Forget the loaded feed pages so the feeds start again from the newest row"""
+    for key in FEED_STATE_KEYS:
+        st.session_state.pop(key, None)
 
 def passenger_journey_page():
+    import pandas as pd
+
+    dm = get_data_manager()
     st.header("🎫 Record Passenger Journey")
 
     # Trip Details Section
@@ -153,31 +234,40 @@ def passenger_journey_page():
             destination = st.text_input("Destination")
             st.session_state.current_journey['destination'] = destination
 
-        fare = st.number_input("Fare Amount per Passenger", min_value=0.0, step=0.5)
-        st.session_state.current_journey['fare'] = fare
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            fare = st.number_input("Fare Amount per Passenger", min_value=0.0, step=0.5)
+            st.session_state.current_journey['fare'] = fare
+        with col2:
+            vehicle = st.text_input("Vehicle Registration")
+        with col3:
+            departure_time = st.time_input("Departure Time", value=None)
 
     # Passenger Details Section
-    st.markdown("""
+    st.markdown(f"""
         <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
             <h4>Add Passenger</h4>
-            <p>Add passengers one by one (Maximum: 11 passengers)</p>
+            <p>Add passengers one by one (Maximum: {DEFAULT_TRIP_CAPACITY} passengers)</p>
         </div>
     """, unsafe_allow_html=True)
 
     # Display current passenger count
     passenger_count = len(st.session_state.current_journey['passengers'])
-    st.info(f"Passengers added: {passenger_count}/11")
-
-    # Add single passenger form
-    if passenger_count < 11:
-        col1, col2 = st.columns(2)
-        with col1:
-            name = st.text_input("Passenger Name", key="new_passenger_name")
-        with col2:
-            phone = st.text_input("Phone Number", key="new_passenger_phone")
-
-        if st.button("Add Passenger", type="primary", disabled=passenger_count >= 11):
+    st.info(f"Passengers added: {passenger_count}/{DEFAULT_TRIP_CAPACITY}")
+
+    # Add single passenger form; passengers are only saved when the trip is recorded
+    if passenger_count < DEFAULT_TRIP_CAPACITY:
+        with st.form("add_passenger_form", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                name = st.text_input("Passenger Name")
+            with col2:
+                phone = st.text_input("Phone Number")
+            submit = st.form_submit_button("Add Passenger", type="primary")
+
+        if submit:
             # Validate inputs
+            phone = normalize_phone(phone)
             errors = []
             if not name:
                 errors.append("Name is required")
@@ -185,37 +275,20 @@ def passenger_journey_page():
                 errors.append("Phone number is required")
             elif not validate_phone(phone):
                 errors.append("Invalid phone number format")
+            elif any(p['phone'] == phone for p in st.session_state.current_journey['passengers']):
+                errors.append("Passenger is already on this trip")
 
             if not errors:
-                try:
-                    # Add passenger to the journey
-                    dm.add_passenger_journey(
-                        name=name,
-                        phone=phone,
-                        origin=origin,
-                        destination=destination,
-                        fare=fare,
-                        journey_date=journey_date
-                    )
-
-                    # Add to current journey list
-                    st.session_state.current_journey['passengers'].append({
-                        'name': name,
-                        'phone': phone
-                    })
-
-                    st.success(f"Passenger {name} added successfully!")
-
-                    # Clear the input fields
-                    st.session_state.new_passenger_name = ""
-                    st.session_state.new_passenger_phone = ""
+                # Add to current journey list
+                st.session_state.current_journey['passengers'].append({
+                    'name': name,
+                    'phone': phone
+                })
 
-                    if len(st.session_state.current_journey['passengers']) >= 11:
-                        st.success("Maximum number of passengers reached!")
+                if len(st.session_state.current_journey['passengers']) >= DEFAULT_TRIP_CAPACITY:
+                    st.success("Maximum number of passengers reached!")
 
-                    st.rerun()
-                except Exception as e:
-                    st.error("Error adding passenger. Please try again.")
+                st.rerun()
             else:
                 for error in errors:
                     st.error(error)
@@ -231,7 +304,36 @@ def passenger_journey_page():
         passengers_df = pd.DataFrame(st.session_state.current_journey['passengers'])
         st.dataframe(passengers_df, use_container_width=True, hide_index=True)
 
-        if st.button("Clear Current Journey", type="secondary"):
+        col1, col2 = st.columns(2)
+        if col1.button("Record Trip", type="primary"):
+            if not origin or not destination:
+                st.error("Origin and destination are required")
+            else:
+                try:
+                    passengers = st.session_state.current_journey['passengers']
+                    save_entry(
+                        dm, 'add_trip',
+                        journey_date=journey_date,
+                        origin=origin,
+                        destination=destination,
+                        fare=fare,
+                        passengers=passengers,
+                        vehicle=vehicle or None,
+                        departure_time=departure_time
+                    )
+                    st.session_state.current_journey = {
+                        'date': None,
+                        'origin': '',
+                        'destination': '',
+                        'fare': 0.0,
+                        'passengers': []
+                    }
+                    st.success(f"Trip recorded with {len(passengers)} passengers!")
+                    st.rerun()
+                except Exception as e:
+                    st.error("Error recording trip. Please try again.")
+
+        if col2.button("Clear Current Journey", type="secondary"):
             st.session_state.current_journey = {
                 'date': None,
                 'origin': '',
@@ -248,17 +350,11 @@ def passenger_journey_page():
         </div>
     """, unsafe_allow_html=True)
 
-    journeys = dm.get_passenger_journeys()
-    if not journeys.empty:
-        st.dataframe(
-            journeys.tail(20),
-            use_container_width=True,
-            hide_index=True
-        )
-    else:
-        st.info("No journeys recorded yet")
+    show_pending_writes()
+    render_feed("journey_feed", dm.get_journey_feed, 20, "No journeys recorded yet")
 
 def vehicle_expenses_page():
+    dm = get_data_manager()
     st.header("💰 Vehicle Expenses")
 
     with st.container():
@@ -280,7 +376,7 @@ def vehicle_expenses_page():
                 if amount <= 0:
                     st.error("Amount must be greater than 0")
                 else:
-                    dm.add_expense(expense_type, amount, date, notes)
+                    save_entry(dm, 'add_expense', expense_type=expense_type, amount=amount, date=date, notes=notes)
                     st.success("Expense recorded successfully")
                     st.rerun()
 
@@ -291,17 +387,14 @@ def vehicle_expenses_page():
                 </div>
             """, unsafe_allow_html=True)
 
-            expenses = dm.get_expenses()
-            if not expenses.empty:
-                st.dataframe(
-                    expenses.tail(10),
-                    use_container_width=True,
-                    hide_index=True
-                )
-            else:
-                st.info("No expenses recorded yet")
+            show_pending_writes()
+            render_feed("expense_feed", dm.get_expense_feed, 10, "No expenses recorded yet")
 
 def financial_reports_page():
+    import pandas as pd
+    import plotly.express as px
+
+    dm = get_data_manager()
     st.header("📊 Financial Reports")
 
     with st.container():
@@ -333,83 +426,288 @@ def financial_reports_page():
             st.error("Start date must be before end date")
             return
 
-        # Calculate metrics
-        metrics = calculate_financial_metrics(dm, start_date, end_date, analysis_type)
+        overview_tab, routes_tab = st.tabs(["📈 Overview", "🗺️ Routes"])
 
-        # Display metrics in a styled container
-        st.markdown("""
-            <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
-                <h4>Financial Overview</h4>
-            </div>
-        """, unsafe_allow_html=True)
+        with overview_tab:
+            # Calculate metrics
+            metrics = calculate_financial_metrics(dm, start_date, end_date, analysis_type)
 
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Total Revenue", f"${metrics['total_revenue']:.2f}")
-        col2.metric("Total Expenses", f"${metrics['total_expenses']:.2f}")
-        col3.metric("Net Profit", f"${metrics['net_profit']:.2f}")
-        if analysis_type == "Trip-based":
-            col4.metric("Passengers", metrics['passenger_count'])
+            # Display metrics in a styled container
+            st.markdown("""
+                <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
+                    <h4>Financial Overview</h4>
+                </div>
+            """, unsafe_allow_html=True)
 
-        # Revenue chart
-        if analysis_type != "Trip-based":
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Total Revenue", f"${metrics['total_revenue']:.2f}")
+            col2.metric("Total Expenses", f"${metrics['total_expenses']:.2f}")
+            col3.metric("Net Profit", f"${metrics['net_profit']:.2f}")
+            if analysis_type == "Trip-based":
+                col4.metric("Passengers", metrics['passenger_count'])
+
+            # Revenue chart
+            if analysis_type != "Trip-based":
+                st.markdown("""
+                    <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
+                        <h4>Revenue Trend</h4>
+                    </div>
+                """, unsafe_allow_html=True)
+
+                revenue_data = dm.get_revenue_by_period(start_date, end_date, analysis_type)
+                if not revenue_data.empty:
+                    fig = px.line(
+                        revenue_data,
+                        x='period',
+                        y='revenue',
+                        title=f'{analysis_type} Revenue Analysis'
+                    )
+                    fig.update_layout(
+                        plot_bgcolor='white',
+                        paper_bgcolor='white',
+                        margin=dict(t=40, l=0, r=0, b=0)
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+
+            # Expense breakdown
             st.markdown("""
                 <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
-                    <h4>Revenue Trend</h4>
+                    <h4>Expense Breakdown</h4>
                 </div>
             """, unsafe_allow_html=True)
 
-            revenue_data = dm.get_revenue_by_period(start_date, end_date, analysis_type)
-            if not revenue_data.empty:
-                fig = px.line(
-                    revenue_data,
-                    x='period',
-                    y='revenue',
-                    title=f'{analysis_type} Revenue Analysis'
+            expense_breakdown = dm.get_expense_breakdown(start_date, end_date)
+            if not expense_breakdown.empty:
+                fig = px.pie(
+                    expense_breakdown,
+                    values='amount',
+                    names='expense_type',
+                    title='Expense Distribution'
                 )
                 fig.update_layout(
-                    plot_bgcolor='white',
-                    paper_bgcolor='white',
+                    showlegend=True,
                     margin=dict(t=40, l=0, r=0, b=0)
                 )
                 st.plotly_chart(fig, use_container_width=True)
 
-        # Expense breakdown
-        st.markdown("""
-            <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
-                <h4>Expense Breakdown</h4>
-            </div>
-        """, unsafe_allow_html=True)
-
-        expense_breakdown = dm.get_expense_breakdown(start_date, end_date)
-        if not expense_breakdown.empty:
-            fig = px.pie(
-                expense_breakdown,
-                values='amount',
-                names='expense_type',
-                title='Expense Distribution'
-            )
-            fig.update_layout(
-                showlegend=True,
-                margin=dict(t=40, l=0, r=0, b=0)
-            )
-            st.plotly_chart(fig, use_container_width=True)
-
-        # Additional analysis
-        if analysis_type != "Trip-based":
+            # Per-trip occupancy, read from the totals kept on each trip
             st.markdown("""
                 <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
-                    <h4>Performance Metrics</h4>
+                    <h4>Trip Occupancy</h4>
                 </div>
             """, unsafe_allow_html=True)
 
-            performance = dm.get_performance_metrics(start_date, end_date, analysis_type)
-            if performance:
-                metrics_df = pd.DataFrame([performance])
+            trips = dm.get_trip_summary(start_date, end_date)
+            if trips.empty:
+                st.info("No trips recorded in this period")
+            else:
                 st.dataframe(
-                    metrics_df,
+                    trips.drop(columns=['trip_id']).assign(occupancy=trips['occupancy'] * 100),
                     use_container_width=True,
-                    hide_index=True
+                    hide_index=True,
+                    column_config={
+                        'occupancy': st.column_config.ProgressColumn(
+                            "Occupancy", format="%.0f%%", min_value=0, max_value=100
+                        )
+                    }
                 )
 
+            # Additional analysis
+            if analysis_type != "Trip-based":
+                st.markdown("""
+                    <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
+                        <h4>Performance Metrics</h4>
+                    </div>
+                """, unsafe_allow_html=True)
+
+                performance = dm.get_performance_metrics(start_date, end_date, analysis_type, breakdown=True)
+                if performance:
+                    totals, by_period = performance
+                    metrics_df = pd.DataFrame([totals])
+                    st.dataframe(
+                        metrics_df,
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                    st.dataframe(
+                        by_period,
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
+        with routes_tab:
+            route_report(dm, start_date, end_date)
+
+        cache_stats = report_cache.stats()
+        st.caption(
+            f"Report cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate)"
+        )
+
+def route_report(dm, start_date, end_date):
+    """Origin x destination heatmap and route profitability table"""
+    import plotly.express as px
+
+    routes = dm.get_route_matrix(start_date, end_date)
+    if routes.empty:
+        st.info("No journeys recorded in this period")
+        return
+
+    metrics = {
+        "Passengers": 'passengers',
+        "Revenue": 'revenue',
+        "Average Fare": 'average_fare',
+        "Revenue per Seat": 'revenue_per_seat',
+        "Load Factor": 'load_factor'
+    }
+    metric = st.selectbox("Heatmap Metric", list(metrics))
+    matrix = routes.pivot_table(
+        index='origin', columns='destination', values=metrics[metric], aggfunc='sum', observed=True
+    )
+    fig = px.imshow(
+        matrix,
+        labels=dict(x="Destination", y="Origin", color=metric),
+        color_continuous_scale='Blues',
+        text_auto=True,
+        aspect='auto',
+        title=f'{metric} by Route'
+    )
+    fig.update_layout(margin=dict(t=40, l=0, r=0, b=0))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        routes,
+        use_container_width=True,
+        hide_index=True
+    )
+
+def import_export_page():
+    import pandas as pd
+    from importer import import_journeys, import_expenses
+    from exporter import export_data
+
+    st.header("📥 Import & Export")
+
+    st.markdown("""
+        <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin-bottom: 1rem;'>
+            <h4>Upload CSV</h4>
+            <p>Journeys: name, phone, origin, destination, fare, journey_date<br>
+            Expenses: expense_type, amount, date, notes</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    kind = st.selectbox("Data Type", ["Journeys", "Expenses"])
+    uploaded = st.file_uploader("CSV File", type=["csv"])
+
+    if uploaded is not None and st.button("Import", type="primary"):
+        source = io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline="")
+        run_import = import_journeys if kind == "Journeys" else import_expenses
+        with st.spinner("Importing..."):
+            result = run_import(source, st.session_state.user_id)
+
+        st.success(f"Imported {result['rows_imported']} of {result['rows_read']} rows")
+        if result['errors']:
+            st.warning(f"{len(result['errors'])} rows were not imported")
+            st.dataframe(
+                pd.DataFrame(result['errors'], columns=["line", "error"]),
+                use_container_width=True,
+                hide_index=True
+            )
+
+    st.markdown("""
+        <div style='background-color: #F5F7FA; padding: 1rem; border-radius: 8px; margin: 1rem 0;'>
+            <h4>Export</h4>
+        </div>
+    """, unsafe_allow_html=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        export_kind = st.selectbox("Export Data", ["Journeys", "Expenses"])
+    with col2:
+        export_format = st.selectbox("Format", ["CSV", "Parquet"])
+    with col3:
+        export_start = st.date_input("From", datetime.now() - timedelta(days=365))
+    with col4:
+        export_end = st.date_input("To", datetime.now())
+
+    if st.button("Prepare Export"):
+        fmt = export_format.lower()
+        name = f"{export_kind.lower()}_{export_start}_{export_end}.{fmt}"
+        # Stream to a temporary file so the export never sits in memory as a DataFrame
+        with tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False) as target:
+            path = target.name
+        try:
+            with st.spinner("Exporting..."):
+                if fmt == "csv":
+                    with open(path, "w", newline="", encoding="utf-8") as target:
+                        rows = export_data(export_kind.lower(), target, st.session_state.user_id,
+                                           export_start, export_end, fmt)
+                else:
+                    rows = export_data(export_kind.lower(), path, st.session_state.user_id,
+                                       export_start, export_end, fmt)
+            # The button takes its copy of the file here, so the file can go straight away
+            with open(path, "rb") as data:
+                st.download_button(f"Download {name} ({rows} rows)", data=data, file_name=name)
+        finally:
+            os.remove(path)
+
+def admin_page():
+    import pandas as pd
+
+    st.header("🛠️ Admin")
+
+    if not INSTRUMENTATION_ENABLED:
+        st.info("Instrumentation is disabled. Set MATRACK_INSTRUMENTATION=1 and restart to collect timings.")
+    else:
+        timing_sections = [
+            ("App Script", 'startup'),
+            ("Pages", 'page'),
+            ("DataManager methods", 'method'),
+            ("SQL by method", 'sql')
+        ]
+        for title, kind in timing_sections:
+            st.subheader(title)
+            rows = timings.summary(kind)
+            if rows:
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+            else:
+                st.info("No timings recorded yet")
+
+        st.subheader(f"Slow Queries (≥ {SLOW_QUERY_MS:.0f} ms)")
+        slow_queries = timings.recent_slow_queries()
+        if slow_queries:
+            st.dataframe(pd.DataFrame(slow_queries), use_container_width=True, hide_index=True)
+        else:
+            st.info("No slow queries recorded")
+
+        if st.button("Reset Timings"):
+            timings.reset()
+            st.rerun()
+
+    if WRITE_BEHIND_ENABLED:
+        st.subheader("Write-Behind Queue")
+        st.json(write_queue.stats())
+
+    if replica_router.enabled:
+        st.subheader("Read Replica")
+        st.json(replica_router.stats())
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.subheader("Connection Pool")
+        st.json(get_pool_stats())
+    with col2:
+        st.subheader("Report Cache")
+        st.json(report_cache.stats())
+        st.subheader("Passenger Cache")
+        st.json(passenger_cache.stats())
+    with col3:
+        st.subheader("Period Views")
+        st.json(period_refresher.stats())
+        if st.button("Refresh Period Views"):
+            period_refresher.refresh()
+            st.rerun()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
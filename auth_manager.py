@@ -1,83 +1,125 @@
 import streamlit as st
-import streamlit_authenticator as stauth
-import bcrypt
-from database import SessionLocal, User
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy import select, update
+from database import session_scope, User
 import os
 
+# Comma-separated emails allowed to see the admin panel
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()}
+
+# Loaded pages and keyset cursors kept by the paginated feeds in app.py
+FEED_STATE_KEYS = ('journey_feed_pages', 'expense_feed_pages')
+
 class AuthManager:
     def __init__(self):
-        self.db = SessionLocal()
         if 'authenticated' not in st.session_state:
             st.session_state.authenticated = False
         if 'user_id' not in st.session_state:
             st.session_state.user_id = None
+        if 'is_admin' not in st.session_state:
+            st.session_state.is_admin = False
+
+    # bcrypt and google-auth are imported on first use so the login page renders without them
 
     def hash_password(self, password):
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        import passwords
+        return passwords.hash_password(password)
 
     def verify_password(self, password, hashed):
-        return bcrypt.checkpw(password.encode(), hashed.encode())
+        import passwords
+        return passwords.verify_password(password, hashed)
 
     def register_user(self, email, password, name):
         try:
-            existing_user = self.db.query(User).filter(User.email == email).first()
-            if existing_user:
-                return False, "Email already registered"
-
+            # Hashed before opening a session so no pooled connection waits on bcrypt
             hashed_password = self.hash_password(password)
-            new_user = User(
-                email=email,
-                password_hash=hashed_password,
-                name=name,
-                is_google_auth=False
-            )
-            self.db.add(new_user)
-            self.db.commit()
+            with session_scope() as db:
+                existing_user = db.query(User).filter(User.email == email).first()
+                if existing_user:
+                    return False, "Email already registered"
+
+                new_user = User(
+                    email=email,
+                    password_hash=hashed_password,
+                    name=name,
+                    is_google_auth=False
+                )
+                db.add(new_user)
             return True, "Registration successful"
         except Exception as e:
-            self.db.rollback()
             return False, str(e)
 
     def login_user(self, email, password):
+        import passwords
+        from passwords import login_throttle
+
+        # Reserved before any hashing so repeated guesses cost no CPU, and atomically
+        # so a burst of concurrent guesses can't all get past the limit
+        retry_after, attempt = login_throttle.reserve(email)
+        if retry_after:
+            return False, f"Too many failed attempts. Try again in {retry_after} seconds"
+
         try:
-            user = self.db.query(User).filter(User.email == email).first()
+            # Short sessions on either side of the password check, so a login
+            # burst waiting on bcrypt doesn't hold connections from the pool
+            with session_scope() as db:
+                user = db.execute(select(User.id, User.password_hash, User.is_google_auth).where(
+                    User.email == email
+                )).first()
+
             if user and not user.is_google_auth and self.verify_password(password, user.password_hash):
+                # Upgrade hashes made with a different cost while we have the password
+                if passwords.needs_rehash(user.password_hash):
+                    password_hash = self.hash_password(password)
+                    with session_scope() as db:
+                        db.execute(update(User).where(User.id == user.id).values(password_hash=password_hash))
+                login_throttle.reset(email)
                 st.session_state.authenticated = True
                 st.session_state.user_id = user.id
+                st.session_state.is_admin = self.is_admin(email)
                 return True, "Login successful"
             return False, "Invalid email or password"
         except Exception as e:
+            # Not a wrong password, so it doesn't count towards the limit
+            login_throttle.release(email, attempt)
             return False, str(e)
 
     def google_auth_callback(self, token):
+        from google_certs import google_certs
+
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, requests.Request(), os.getenv('GOOGLE_CLIENT_ID'))
+            # Verified locally against cached signing certificates
+            idinfo = google_certs.verify_token(token, os.getenv('GOOGLE_CLIENT_ID'))
             
             email = idinfo['email']
-            user = self.db.query(User).filter(User.email == email).first()
-            
-            if not user:
-                user = User(
-                    email=email,
-                    name=idinfo.get('name'),
-                    is_google_auth=True,
-                    google_id=idinfo['sub']
-                )
-                self.db.add(user)
-                self.db.commit()
-            
+            with session_scope() as db:
+                user = db.query(User).filter(User.email == email).first()
+
+                if not user:
+                    user = User(
+                        email=email,
+                        name=idinfo.get('name'),
+                        is_google_auth=True,
+                        google_id=idinfo['sub']
+                    )
+                    db.add(user)
+                    db.flush()
+
+                user_id = user.id
+
             st.session_state.authenticated = True
-            st.session_state.user_id = user.id
+            st.session_state.user_id = user_id
+            st.session_state.is_admin = self.is_admin(email)
             return True, "Google login successful"
         except Exception as e:
             return False, str(e)
 
+    def is_admin(self, email):
+        return email.strip().lower() in ADMIN_EMAILS
+
     def logout_user(self):
         st.session_state.authenticated = False
         st.session_state.user_id = None
-
-    def __del__(self):
-        self.db.close()
+        st.session_state.is_admin = False
+        # Feed pages hold this owner's rows; the next user starts from the newest
+        for key in FEED_STATE_KEYS:
+            st.session_state.pop(key, None)
@@ -0,0 +1,216 @@
+"""Benchmark suite for DataManager and the report helpers.
+
+For each backend and data size a fresh database is filled by fleet_generator
+and every DataManager read and write method, plus
+utils.calculate_financial_metrics, is timed over several runs with the report
+cache cleared so the database path is measured. Each backend/size pair runs in
+its own process because the engine is configured once from DATABASE_URL.
+
+Results are written as JSON and can be compared against a saved baseline; the
+command exits non-zero when a method's median slows down beyond the tolerance.
+
+Usage:
+    python benchmark.py --sizes 1000,10000,100000 --output bench.json
+    python benchmark.py --backends sqlite,postgresql://bench@localhost/bench_db \\
+        --baseline bench_baseline.json --tolerance 0.25
+
+A Postgres URL must point at a disposable database: its tables are dropped
+and recreated for every run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Fixed so the same seed produces the same data on every run
+END_DATE = date(2025, 12, 31)
+SEED = 42
+
+def _benchmarks(dm, utils):
+    """(name, callable) pairs covering every DataManager method"""
+    month_start = END_DATE - timedelta(days=30)
+    year_start = END_DATE - timedelta(days=364)
+    counter = iter(range(10 ** 9))
+
+    def new_phone():
+        return f'0799{next(counter):06d}'
+
+    return [
+        ('DataManager.get_passenger_journeys', lambda: dm.get_passenger_journeys()),
+        ('DataManager.get_expenses', lambda: dm.get_expenses()),
+        ('DataManager.get_journey_feed', lambda: dm.get_journey_feed(limit=20)),
+        ('DataManager.get_expense_feed', lambda: dm.get_expense_feed(limit=10)),
+        ('DataManager.get_financial_summary', lambda: dm.get_financial_summary(year_start, END_DATE)),
+        ('DataManager.get_revenue_by_period[Weekly]',
+         lambda: dm.get_revenue_by_period(year_start, END_DATE, 'Weekly')),
+        ('DataManager.get_revenue_by_period[Monthly]',
+         lambda: dm.get_revenue_by_period(year_start, END_DATE, 'Monthly')),
+        ('DataManager.get_performance_metrics',
+         lambda: dm.get_performance_metrics(month_start, END_DATE, 'Monthly')),
+        ('DataManager.get_performance_metrics[breakdown]',
+         lambda: dm.get_performance_metrics(year_start, END_DATE, 'Weekly', breakdown=True)),
+        ('DataManager.get_expense_breakdown', lambda: dm.get_expense_breakdown(year_start, END_DATE)),
+        ('DataManager.get_route_matrix', lambda: dm.get_route_matrix(year_start, END_DATE)),
+        ('DataManager.get_trip_summary', lambda: dm.get_trip_summary(month_start, END_DATE)),
+        ('DataManager.get_trip_passengers', lambda: dm.get_trip_passengers(1)),
+        ('utils.calculate_financial_metrics',
+         lambda: utils.calculate_financial_metrics(dm, month_start, END_DATE, 'Monthly')),
+        ('DataManager.add_passenger_journey',
+         lambda: dm.add_passenger_journey('Bench', new_phone(), 'Nairobi', 'Kisii', 1600.0, END_DATE)),
+        ('DataManager.add_trip',
+         lambda: dm.add_trip(END_DATE, 'Nairobi', 'Kisumu', 1500.0,
+                             [{'name': 'Bench', 'phone': new_phone()} for _ in range(11)])),
+        ('DataManager.add_expense', lambda: dm.add_expense('Fuel', 5000.0, END_DATE, None)),
+    ]
+
+def _reset_schema():
+    from database import engine, Base
+    from migrations import migration_metadata
+    from period_views import drop_period_views
+
+    with engine.begin() as conn:
+        drop_period_views(conn)
+    Base.metadata.drop_all(bind=engine)
+    migration_metadata.drop_all(bind=engine)
+
+def run_worker(size, repeat):
+    """Generate data of the given size in DATABASE_URL and time every benchmark"""
+    import utils
+    from database import engine
+    from data_manager import DataManager
+    from fleet_generator import generate
+    from report_cache import report_cache
+
+    _reset_schema()
+    started = time.perf_counter()
+    owner_id = generate(
+        owners=1,
+        passengers=max(100, size // 20),
+        journeys=size,
+        expenses=max(50, size // 50),
+        days=365,
+        end_date=END_DATE,
+        seed=SEED
+    )[0]
+    generate_seconds = time.perf_counter() - started
+
+    dm = DataManager(owner_id=owner_id)
+    results = []
+    for name, call in _benchmarks(dm, utils):
+        timings = []
+        for _ in range(repeat):
+            report_cache.clear()
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results.append({
+            'backend': engine.dialect.name,
+            'size': size,
+            'method': name,
+            'runs': repeat,
+            'min_ms': round(timings[0], 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3)
+        })
+    return {'generate_seconds': round(generate_seconds, 3), 'results': results}
+
+def _run_backend(backend, size, repeat):
+    if backend == 'sqlite':
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        url = f'sqlite:///{path}'
+    else:
+        path, url = None, backend
+
+    env = dict(os.environ, DATABASE_URL=url)
+    try:
+        completed = subprocess.run(
+            [sys.executable, __file__, '--worker', '--size', str(size), '--repeat', str(repeat)],
+            env=env, capture_output=True, text=True, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Benchmark worker failed for {backend} at size {size}:\n{e.stderr}")
+    finally:
+        if path:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, tolerance, min_delta_ms=1.0):
+    """Get (entry, baseline_entry) pairs whose median regressed beyond the tolerance"""
+    previous = {(r['backend'], r['size'], r['method']): r for r in baseline['results']}
+    regressions = []
+    for entry in results['results']:
+        old = previous.get((entry['backend'], entry['size'], entry['method']))
+        if old is None:
+            continue
+        slower_by = entry['median_ms'] - old['median_ms']
+        if slower_by > min_delta_ms and entry['median_ms'] > old['median_ms'] * (1 + tolerance):
+            regressions.append((entry, old))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataManager methods across sizes and backends")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated journey counts")
+    parser.add_argument("--backends", default="sqlite",
+                        help="Comma-separated list of 'sqlite' and/or database URLs")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per method")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown of the median before failing")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.size, args.repeat)))
+        return
+
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': SEED,
+            'repeat': args.repeat
+        },
+        'generate_seconds': {},
+        'results': []
+    }
+    for backend in args.backends.split(','):
+        for size in (int(s) for s in args.sizes.split(',')):
+            run = _run_backend(backend, size, args.repeat)
+            label = run['results'][0]['backend'] if run['results'] else backend
+            results['generate_seconds'][f'{label}:{size}'] = run['generate_seconds']
+            results['results'].extend(run['results'])
+            for entry in run['results']:
+                print(f"{entry['backend']:<10} {entry['size']:>8} {entry['method']:<50} "
+                      f"median {entry['median_ms']:>9.2f} ms  p95 {entry['p95_ms']:>9.2f} ms")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        for entry, old in regressions:
+            print(f"REGRESSION {entry['backend']} {entry['size']} {entry['method']}: "
+                  f"{old['median_ms']:.2f} ms -> {entry['median_ms']:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
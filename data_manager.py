@@ -1,179 +1,593 @@
+import functools
 import pandas as pd
 from datetime import datetime, timedelta
-from database import SessionLocal, Passenger, Journey, Expense
-from sqlalchemy import func, extract
+from database import (
+    session_scope, Passenger, Journey, Expense, Trip, DailyOwnerStats,
+    DailyRouteStats, DEFAULT_TRIP_CAPACITY
+)
+from rollups import add_journey_stats, add_expense_stats, add_route_stats
+from period_views import period_stats_rows, expense_rows
+from report_cache import report_cache
+from read_replica import read_session_scope, replica_router
+from places import place_ids, OriginPlace, DestinationPlace
+from passengers import passenger_ids
+from instrumentation import traced
+from sqlalchemy import func, extract, select, insert, update, or_, and_
 import streamlit as st
 
+def performance_kpis(trips, passengers, revenue, expenses):
+    """Build the performance metrics dict shown on the reports page"""
+    return {
+        'Total Trips': trips,
+        'Total Passengers': passengers,
+        'Average Passengers per Trip': round(passengers / trips if trips > 0 else 0, 2),
+        'Average Revenue per Trip': round(revenue / trips if trips > 0 else 0, 2),
+        'Total Expenses': expenses
+    }
+
+# Explicit column types for DataFrames built from query results
+JOURNEY_DTYPES = {
+    'journey_date': 'datetime64[ns]',
+    'origin': 'category',
+    'destination': 'category',
+    'fare': 'float64'
+}
+TRIP_DTYPES = {
+    'trip_date': 'datetime64[ns]',
+    'vehicle': 'category',
+    'origin': 'category',
+    'destination': 'category',
+    'fare': 'float64',
+    'capacity': 'int64',
+    'seats_sold': 'int64',
+    'occupancy': 'float64',
+    'revenue': 'float64'
+}
+ROUTE_DTYPES = {
+    'origin': 'category',
+    'destination': 'category',
+    'passengers': 'int64',
+    'revenue': 'float64',
+    'trips': 'int64',
+    'seats_offered': 'int64',
+    'seats_sold': 'int64',
+    'trip_revenue': 'float64'
+}
+EXPENSE_DTYPES = {
+    'expense_type': 'category',
+    'amount': 'float64',
+    'date': 'datetime64[ns]'
+}
+
+def typed_frame(rows, columns, dtypes):
+    """Build a DataFrame straight from result rows and apply explicit column types"""
+    frame = pd.DataFrame.from_records(rows, columns=list(columns))
+    return frame.astype({c: t for c, t in dtypes.items() if c in frame.columns})
+
+def journeys_query(owner_id, start_date=None, end_date=None):
+    """Select the owner's journeys, optionally between dates, which limits the partitions scanned"""
+    query = select(
+        Journey.journey_date,
+        Passenger.name,
+        Passenger.phone,
+        OriginPlace.name.label('origin'),
+        DestinationPlace.name.label('destination'),
+        Journey.fare
+    ).join(Passenger).join(OriginPlace, Journey.origin_id == OriginPlace.id).join(
+        DestinationPlace, Journey.destination_id == DestinationPlace.id
+    ).where(Passenger.owner_id == owner_id)
+    if start_date is not None:
+        query = query.where(Journey.journey_date >= start_date)
+    if end_date is not None:
+        query = query.where(Journey.journey_date <= end_date)
+    return query
+
+def expenses_query(owner_id, start_date=None, end_date=None):
+    """Select the owner's expenses, optionally between dates, which limits the partitions scanned"""
+    query = select(
+        Expense.expense_type,
+        Expense.amount,
+        Expense.date,
+        Expense.notes
+    ).where(Expense.owner_id == owner_id)
+    if start_date is not None:
+        query = query.where(Expense.date >= start_date)
+    if end_date is not None:
+        query = query.where(Expense.date <= end_date)
+    return query
+
+def copy_result(value):
+    """Copy a report result (dict, DataFrame, or a tuple of them)"""
+    if isinstance(value, tuple):
+        return tuple(copy_result(v) for v in value)
+    return value.copy() if value is not None else None
+
+def cached_report(method):
+    """Serve a report from the per-owner cache until the owner writes new data"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        owner_id = self.current_owner_id()
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        found, value, version = report_cache.get(owner_id, key)
+        if not found:
+            value = method(self, *args, **kwargs)
+            report_cache.set(owner_id, key, version, value)
+        # Hand out copies so callers cannot modify the cached result
+        return copy_result(value)
+    return wrapper
+
+def record_trip(db, owner_id, journey_date, origin, destination, fare, passengers,
+                vehicle=None, departure_time=None, capacity=DEFAULT_TRIP_CAPACITY):
+    """Insert a trip, its journeys and their rollups in the session's transaction. Returns the trip id."""
+    if not passengers:
+        raise Exception("A trip needs at least one passenger")
+    if len(passengers) > capacity:
+        raise Exception(f"A trip has only {capacity} seats")
+
+    ids_by_phone = passenger_ids(db, owner_id, passengers)
+    ids_by_place = place_ids(db, [origin, destination])
+    trip_id = db.execute(insert(Trip).returning(Trip.id), {
+        'owner_id': owner_id,
+        'vehicle': vehicle,
+        'trip_date': journey_date,
+        'departure_time': departure_time,
+        'origin_id': ids_by_place[origin],
+        'destination_id': ids_by_place[destination],
+        'fare': fare,
+        'capacity': capacity,
+        'seats_sold': len(passengers),
+        'revenue': fare * len(passengers)
+    }).scalar_one()
+    db.execute(insert(Journey), [{
+        'passenger_id': ids_by_phone[p['phone']],
+        'trip_id': trip_id,
+        'origin_id': ids_by_place[origin],
+        'destination_id': ids_by_place[destination],
+        'fare': fare,
+        'journey_date': journey_date
+    } for p in passengers])
+    add_journey_stats(db, owner_id, {
+        journey_date: (len(passengers), fare * len(passengers))
+    }, new_trips=1)
+    add_route_stats(db, owner_id, {
+        (journey_date, ids_by_place[origin], ids_by_place[destination]):
+            (len(passengers), fare * len(passengers), 1, capacity, len(passengers), fare * len(passengers))
+    })
+    return trip_id
+
+def record_passenger_journey(db, owner_id, name, phone, origin, destination, fare, journey_date,
+                             trip_id=None):
+    """Insert one journey and its rollups in the session's transaction, on an existing trip or its own"""
+    ids_by_place = place_ids(db, [origin, destination])
+    if trip_id is not None:
+        # Claim the seat with a guarded update so concurrent bookings can't overfill the trip
+        claimed = db.execute(update(Trip).where(
+            Trip.id == trip_id,
+            Trip.owner_id == owner_id,
+            Trip.seats_sold < Trip.capacity
+        ).values(
+            seats_sold=Trip.seats_sold + 1,
+            revenue=Trip.revenue + fare
+        )).rowcount
+        if claimed != 1:
+            raise Exception("Trip is full or does not exist")
+        # Joining a trip adds a passenger to it, not another trip
+        new_trips, seats_offered = 0, 0
+    else:
+        # A journey entered on its own is a trip of its own, which later passengers can join
+        trip_id = db.execute(insert(Trip).returning(Trip.id), {
+            'owner_id': owner_id,
+            'trip_date': journey_date,
+            'origin_id': ids_by_place[origin],
+            'destination_id': ids_by_place[destination],
+            'fare': fare,
+            'capacity': DEFAULT_TRIP_CAPACITY,
+            'seats_sold': 1,
+            'revenue': fare
+        }).scalar_one()
+        new_trips, seats_offered = 1, DEFAULT_TRIP_CAPACITY
+
+    passenger_id = passenger_ids(db, owner_id, [{'name': name, 'phone': phone}])[phone]
+    db.add(Journey(
+        passenger_id=passenger_id,
+        trip_id=trip_id,
+        origin_id=ids_by_place[origin],
+        destination_id=ids_by_place[destination],
+        fare=fare,
+        journey_date=journey_date
+    ))
+    db.flush()
+    add_journey_stats(db, owner_id, {journey_date: (1, fare)}, new_trips=new_trips)
+    add_route_stats(db, owner_id, {
+        (journey_date, ids_by_place[origin], ids_by_place[destination]):
+            (1, fare, new_trips, seats_offered, 1, fare)
+    })
+
+def record_expense(db, owner_id, expense_type, amount, date, notes):
+    """Insert an expense and its rollups in the session's transaction"""
+    db.add(Expense(
+        expense_type=expense_type,
+        amount=amount,
+        date=date,
+        notes=notes,
+        owner_id=owner_id
+    ))
+    add_expense_stats(db, owner_id, [(date, expense_type, amount)])
+
 class DataManager:
-    def __init__(self):
-        self.db = SessionLocal()
+    def __init__(self, owner_id=None):
+        # Without an explicit owner every call acts for the logged-in Streamlit user
+        self.owner_id = owner_id
+
+    def current_owner_id(self):
+        """Get the owner whose data this manager reads and writes"""
+        if self.owner_id is not None:
+            return self.owner_id
+        if st.session_state.get('user_id') is None:
+            raise Exception("User not authenticated")
+        return st.session_state.user_id
 
-    def add_passenger_journey(self, name, phone, origin, destination, fare, journey_date):
-        """Add a new passenger journey"""
+    @traced
+    def add_trip(self, journey_date, origin, destination, fare, passengers,
+                 vehicle=None, departure_time=None, capacity=DEFAULT_TRIP_CAPACITY):
+        """Record a trip and all of its passengers in a single transaction. Returns the trip id."""
         try:
-            if 'user_id' not in st.session_state:
-                raise Exception("User not authenticated")
-
-            # Check if passenger exists
-            passenger = self.db.query(Passenger).filter_by(
-                phone=phone,
-                owner_id=st.session_state.user_id
-            ).first()
-
-            if not passenger:
-                passenger = Passenger(
-                    name=name,
-                    phone=phone,
-                    owner_id=st.session_state.user_id
-                )
-                self.db.add(passenger)
-                self.db.flush()
-
-            # Create journey
-            journey = Journey(
-                passenger_id=passenger.id,
-                origin=origin,
-                destination=destination,
-                fare=fare,
-                journey_date=journey_date
-            )
-            self.db.add(journey)
-            self.db.commit()
+            owner_id = self.current_owner_id()
+            with session_scope() as db:
+                trip_id = record_trip(db, owner_id, journey_date, origin, destination, fare, passengers,
+                                      vehicle, departure_time, capacity)
+            replica_router.record_write(owner_id)
+            report_cache.invalidate_owner(owner_id)
+            return trip_id
+        except Exception as e:
+            raise Exception(f"Error adding trip: {str(e)}")
+
+    @traced
+    def add_passenger_journey(self, name, phone, origin, destination, fare, journey_date, trip_id=None):
+        """Add a new passenger journey, optionally taking a seat on an existing trip"""
+        try:
+            owner_id = self.current_owner_id()
+            with session_scope() as db:
+                record_passenger_journey(db, owner_id, name, phone, origin, destination, fare,
+                                         journey_date, trip_id)
+            replica_router.record_write(owner_id)
+            report_cache.invalidate_owner(owner_id)
         except Exception as e:
-            self.db.rollback()
             raise Exception(f"Error adding passenger journey: {str(e)}")
 
-    def get_passenger_journeys(self):
-        """Get all passenger journeys for the current user"""
+    @traced
+    def get_passenger_journeys(self, start_date=None, end_date=None):
+        """Get the current user's passenger journeys, all of them unless dates are given"""
         try:
-            journeys = self.db.query(
-                Journey.journey_date,
-                Passenger.name,
-                Passenger.phone,
-                Journey.origin,
-                Journey.destination,
-                Journey.fare
-            ).join(Passenger).filter(
-                Passenger.owner_id == st.session_state.user_id
-            ).all()
-
-            return pd.DataFrame([{
-                'journey_date': j.journey_date,
-                'name': j.name,
-                'phone': j.phone,
-                'origin': j.origin,
-                'destination': j.destination,
-                'fare': j.fare
-            } for j in journeys])
+            with read_session_scope(self.current_owner_id()) as db:
+                result = db.execute(journeys_query(self.current_owner_id(), start_date, end_date))
+                columns, rows = result.keys(), result.all()
+
+            return typed_frame(rows, columns, JOURNEY_DTYPES)
         except Exception as e:
             raise Exception(f"Error reading passenger journeys: {str(e)}")
 
+    @traced
+    def get_journey_feed(self, limit=20, cursor=None):
+        """Get a page of the most recent journeys, newest first.
+
+        ``cursor`` is the ``(journey_date, id)`` of the last row of the previous
+        page. Returns the page and the cursor for the next one (None when done).
+        """
+        try:
+            with read_session_scope(self.current_owner_id()) as db:
+                query = db.query(
+                    Journey.id,
+                    Journey.journey_date,
+                    Passenger.name,
+                    Passenger.phone,
+                    OriginPlace.name,
+                    DestinationPlace.name,
+                    Journey.fare
+                ).join(Passenger).join(OriginPlace, Journey.origin_id == OriginPlace.id).join(
+                    DestinationPlace, Journey.destination_id == DestinationPlace.id
+                ).filter(
+                    Passenger.owner_id == self.current_owner_id()
+                )
+
+                if cursor is not None:
+                    cursor_date, cursor_id = cursor
+                    query = query.filter(or_(
+                        Journey.journey_date < cursor_date,
+                        and_(Journey.journey_date == cursor_date, Journey.id < cursor_id)
+                    ))
+
+                # Fetch one extra row to know whether another page exists
+                rows = query.order_by(
+                    Journey.journey_date.desc(),
+                    Journey.id.desc()
+                ).limit(limit + 1).all()
+
+                page = rows[:limit]
+                next_cursor = (page[-1].journey_date, page[-1].id) if len(rows) > limit else None
+
+            columns = ['id', 'journey_date', 'name', 'phone', 'origin', 'destination', 'fare']
+            return typed_frame(page, columns, JOURNEY_DTYPES).drop(columns='id'), next_cursor
+        except Exception as e:
+            raise Exception(f"Error reading journey feed: {str(e)}")
+
+    @traced
+    @cached_report
+    def get_trip_summary(self, start_date, end_date):
+        """Get per-trip occupancy and revenue, newest first, from the trip totals"""
+        try:
+            with read_session_scope(self.current_owner_id()) as db:
+                rows = db.execute(select(
+                    Trip.id,
+                    Trip.trip_date,
+                    Trip.departure_time,
+                    Trip.vehicle,
+                    OriginPlace.name,
+                    DestinationPlace.name,
+                    Trip.fare,
+                    Trip.capacity,
+                    Trip.seats_sold,
+                    (Trip.seats_sold * 1.0 / Trip.capacity).label('occupancy'),
+                    Trip.revenue
+                ).join(OriginPlace, Trip.origin_id == OriginPlace.id).join(
+                    DestinationPlace, Trip.destination_id == DestinationPlace.id
+                ).where(
+                    Trip.owner_id == self.current_owner_id(),
+                    Trip.trip_date.between(start_date, end_date)
+                ).order_by(Trip.trip_date.desc(), Trip.id.desc())).all()
+
+            return typed_frame(rows, [
+                'trip_id', 'trip_date', 'departure_time', 'vehicle', 'origin', 'destination',
+                'fare', 'capacity', 'seats_sold', 'occupancy', 'revenue'
+            ], TRIP_DTYPES)
+        except Exception as e:
+            raise Exception(f"Error fetching trip summary: {str(e)}")
+
+    @traced
+    def get_trip_passengers(self, trip_id):
+        """Get the passengers booked on one trip"""
+        try:
+            with read_session_scope(self.current_owner_id()) as db:
+                rows = db.execute(select(
+                    Passenger.name,
+                    Passenger.phone,
+                    Journey.fare
+                ).join(Journey.passenger).where(
+                    Journey.trip_id == trip_id,
+                    Passenger.owner_id == self.current_owner_id()
+                ).order_by(Journey.id)).all()
+
+            return typed_frame(rows, ['name', 'phone', 'fare'], JOURNEY_DTYPES)
+        except Exception as e:
+            raise Exception(f"Error fetching trip passengers: {str(e)}")
+
+    @traced
     def add_expense(self, expense_type, amount, date, notes):
         """Add a new expense"""
         try:
-            expense = Expense(
-                expense_type=expense_type,
-                amount=amount,
-                date=date,
-                notes=notes,
-                owner_id=st.session_state.user_id
-            )
-            self.db.add(expense)
-            self.db.commit()
+            owner_id = self.current_owner_id()
+            with session_scope() as db:
+                record_expense(db, owner_id, expense_type, amount, date, notes)
+            replica_router.record_write(owner_id)
+            report_cache.invalidate_owner(owner_id)
         except Exception as e:
-            self.db.rollback()
             raise Exception(f"Error adding expense: {str(e)}")
 
-    def get_expenses(self):
-        """Get all expenses for the current user"""
+    @traced
+    def get_expenses(self, start_date=None, end_date=None):
+        """Get the current user's expenses, all of them unless dates are given"""
         try:
-            expenses = self.db.query(Expense).filter(
-                Expense.owner_id == st.session_state.user_id
-            ).all()
-            return pd.DataFrame([{
-                'expense_type': e.expense_type,
-                'amount': e.amount,
-                'date': e.date,
-                'notes': e.notes
-            } for e in expenses])
+            with read_session_scope(self.current_owner_id()) as db:
+                result = db.execute(expenses_query(self.current_owner_id(), start_date, end_date))
+                columns, rows = result.keys(), result.all()
+
+            return typed_frame(rows, columns, EXPENSE_DTYPES)
         except Exception as e:
             raise Exception(f"Error reading expenses: {str(e)}")
 
+    @traced
+    def get_expense_feed(self, limit=10, cursor=None):
+        """Get a page of the most recent expenses, newest first.
+
+        ``cursor`` is the ``(date, id)`` of the last row of the previous page.
+        Returns the page and the cursor for the next one (None when done).
+        """
+        try:
+            with read_session_scope(self.current_owner_id()) as db:
+                query = db.query(
+                    Expense.id,
+                    Expense.expense_type,
+                    Expense.amount,
+                    Expense.date,
+                    Expense.notes
+                ).filter(
+                    Expense.owner_id == self.current_owner_id()
+                )
+
+                if cursor is not None:
+                    cursor_date, cursor_id = cursor
+                    query = query.filter(or_(
+                        Expense.date < cursor_date,
+                        and_(Expense.date == cursor_date, Expense.id < cursor_id)
+                    ))
+
+                # Fetch one extra row to know whether another page exists
+                rows = query.order_by(
+                    Expense.date.desc(),
+                    Expense.id.desc()
+                ).limit(limit + 1).all()
+
+                page = rows[:limit]
+                next_cursor = (page[-1].date, page[-1].id) if len(rows) > limit else None
+
+            columns = ['id', 'expense_type', 'amount', 'date', 'notes']
+            return typed_frame(page, columns, EXPENSE_DTYPES).drop(columns='id'), next_cursor
+        except Exception as e:
+            raise Exception(f"Error reading expense feed: {str(e)}")
+
+    @traced
+    @cached_report
+    def get_financial_summary(self, start_date, end_date):
+        """Get revenue, expenses, net profit and passenger count between dates in one query"""
+        try:
+            with read_session_scope(self.current_owner_id()) as db:
+                row = db.execute(select(
+                    func.coalesce(func.sum(DailyOwnerStats.revenue), 0.0).label('total_revenue'),
+                    func.coalesce(func.sum(DailyOwnerStats.expenses), 0.0).label('total_expenses'),
+                    func.coalesce(func.sum(DailyOwnerStats.passenger_count), 0).label('passenger_count')
+                ).where(
+                    DailyOwnerStats.owner_id == self.current_owner_id(),
+                    DailyOwnerStats.day.between(start_date, end_date)
+                )).one()
+
+            total_revenue = float(row.total_revenue)
+            total_expenses = float(row.total_expenses)
+            return {
+                'total_revenue': total_revenue,
+                'total_expenses': total_expenses,
+                'net_profit': total_revenue - total_expenses,
+                'passenger_count': int(row.passenger_count)
+            }
+        except Exception as e:
+            raise Exception(f"Error calculating financial summary: {str(e)}")
+
+    @traced
+    @cached_report
     def get_revenue_by_period(self, start_date, end_date, period_type):
-        """Get revenue analysis by period (Weekly/Monthly)"""
+        """Get revenue analysis by period (Weekly/Monthly); whole periods come from the period views"""
         try:
-            query = self.db.query(
-                func.date_trunc(
-                    'week' if period_type == 'Weekly' else 'month',
-                    Journey.journey_date
-                ).label('period'),
-                func.sum(Journey.fare).label('revenue')
-            ).join(Passenger).filter(
-                Journey.journey_date.between(start_date, end_date),
-                Passenger.owner_id == st.session_state.user_id
-            ).group_by('period').order_by('period')
-
-            results = query.all()
-
-            return pd.DataFrame([{
-                'period': r.period,
-                'revenue': r.revenue
-            } for r in results])
+            with read_session_scope(self.current_owner_id()) as db:
+                rows = period_stats_rows(db, self.current_owner_id(), period_type, start_date, end_date)
+                results = db.execute(select(
+                    rows.c.period,
+                    func.sum(rows.c.revenue).label('revenue')
+                ).group_by(rows.c.period).having(
+                    func.sum(rows.c.passenger_count) > 0
+                ).order_by(rows.c.period)).all()
+
+            return typed_frame(results, ['period', 'revenue'], {
+                'period': 'datetime64[ns]',
+                'revenue': 'float64'
+            })
         except Exception as e:
             raise Exception(f"Error calculating revenue by period: {str(e)}")
 
-    def get_performance_metrics(self, start_date, end_date, period_type):
-        """Get performance metrics for the selected period"""
+    @traced
+    @cached_report
+    def get_performance_metrics(self, start_date, end_date, period_type, breakdown=False):
+        """Get performance metrics for the selected period.
+
+        With ``breakdown=True`` the same query also groups the KPIs by week or
+        month (per ``period_type``) and the result is ``(totals, DataFrame)``.
+        """
         try:
-            # Get journey metrics
-            journeys = self.db.query(Journey).join(Passenger).filter(
-                Journey.journey_date.between(start_date, end_date),
-                Passenger.owner_id == st.session_state.user_id
-            ).all()
-
-            # Get expense metrics
-            expenses = self.db.query(Expense).filter(
-                Expense.date.between(start_date, end_date),
-                Expense.owner_id == st.session_state.user_id
-            ).all()
-
-            if not journeys:
+            owner_id = self.current_owner_id()
+            with read_session_scope(self.current_owner_id()) as db:
+                if breakdown:
+                    # Whole weeks or months come from the period views, the other days from the daily rollup
+                    source = period_stats_rows(db, owner_id, period_type, start_date, end_date).c
+                else:
+                    source = DailyOwnerStats
+                totals = [
+                    func.sum(source.trip_count).label('trips'),
+                    func.sum(source.passenger_count).label('passengers'),
+                    func.sum(source.revenue).label('revenue'),
+                    func.sum(source.expenses).label('expenses')
+                ]
+                if breakdown:
+                    query = select(source.period, *totals).group_by(source.period).order_by(source.period)
+                else:
+                    query = select(*totals).where(
+                        DailyOwnerStats.owner_id == owner_id,
+                        DailyOwnerStats.day.between(start_date, end_date)
+                    )
+                rows = db.execute(query).all()
+
+            total_trips = sum(int(r.trips or 0) for r in rows)
+            if total_trips == 0:
                 return None
 
-            # Calculate metrics
-            total_trips = len(set(j.journey_date for j in journeys))
-            total_passengers = len(journeys)
-            total_revenue = sum(j.fare for j in journeys)
-            total_expenses = sum(e.amount for e in expenses)
+            totals = performance_kpis(
+                total_trips,
+                sum(int(r.passengers or 0) for r in rows),
+                sum(float(r.revenue or 0) for r in rows),
+                sum(float(r.expenses or 0) for r in rows)
+            )
+            if not breakdown:
+                return totals
 
-            return {
-                'Total Trips': total_trips,
-                'Total Passengers': total_passengers,
-                'Average Passengers per Trip': round(total_passengers / total_trips if total_trips > 0 else 0, 2),
-                'Average Revenue per Trip': round(total_revenue / total_trips if total_trips > 0 else 0, 2),
-                'Total Expenses': total_expenses
-            }
+            return totals, pd.DataFrame([{
+                'period': r.period,
+                **performance_kpis(int(r.trips or 0), int(r.passengers or 0),
+                                   float(r.revenue or 0), float(r.expenses or 0))
+            } for r in rows]).astype({'period': 'datetime64[ns]'})
         except Exception as e:
             raise Exception(f"Error calculating performance metrics: {str(e)}")
 
+    @traced
+    @cached_report
     def get_expense_breakdown(self, start_date, end_date):
-        """Get expense breakdown between dates"""
+        """Get expense breakdown between dates; whole months come from the period views"""
         try:
-            expenses = self.db.query(
-                Expense.expense_type,
-                func.sum(Expense.amount).label('amount')
-            ).filter(
-                Expense.date.between(start_date, end_date),
-                Expense.owner_id == st.session_state.user_id
-            ).group_by(Expense.expense_type).all()
-
-            return pd.DataFrame([{
-                'expense_type': e.expense_type,
-                'amount': e.amount
-            } for e in expenses])
+            with read_session_scope(self.current_owner_id()) as db:
+                rows = expense_rows(db, self.current_owner_id(), start_date, end_date)
+                expenses = db.execute(select(
+                    rows.c.expense_type,
+                    func.sum(rows.c.amount).label('amount')
+                ).group_by(rows.c.expense_type)).all()
+
+            return typed_frame(expenses, ['expense_type', 'amount'], EXPENSE_DTYPES)
         except Exception as e:
             raise Exception(f"Error calculating expense breakdown: {str(e)}")
 
-    def __del__(self):
-        """Close the database session"""
-        self.db.close()
\ No newline at end of file
+    @traced
+    @cached_report
+    def get_route_matrix(self, start_date, end_date):
+        """Get passengers, revenue and per-seat figures for every origin and destination pair.
+
+        Aggregates the daily route rollup on the integer place ids and only
+        then joins the places for their names. revenue_per_seat and
+        load_factor divide the seats sold and revenue of the period's trips by
+        the seats those trips offered.
+        """
+        try:
+            totals = select(
+                DailyRouteStats.origin_id,
+                DailyRouteStats.destination_id,
+                func.sum(DailyRouteStats.passenger_count).label('passengers'),
+                func.sum(DailyRouteStats.revenue).label('revenue'),
+                func.sum(DailyRouteStats.trip_count).label('trips'),
+                func.sum(DailyRouteStats.seats_offered).label('seats_offered'),
+                func.sum(DailyRouteStats.seats_sold).label('seats_sold'),
+                func.sum(DailyRouteStats.trip_revenue).label('trip_revenue')
+            ).where(
+                DailyRouteStats.owner_id == self.current_owner_id(),
+                DailyRouteStats.day.between(start_date, end_date)
+            ).group_by(DailyRouteStats.origin_id, DailyRouteStats.destination_id).subquery()
+
+            with read_session_scope(self.current_owner_id()) as db:
+                rows = db.execute(select(
+                    OriginPlace.name,
+                    DestinationPlace.name,
+                    totals.c.passengers,
+                    totals.c.revenue,
+                    totals.c.trips,
+                    totals.c.seats_offered,
+                    totals.c.seats_sold,
+                    totals.c.trip_revenue
+                ).join(OriginPlace, totals.c.origin_id == OriginPlace.id).join(
+                    DestinationPlace, totals.c.destination_id == DestinationPlace.id
+                ).order_by(totals.c.revenue.desc())).all()
+
+            routes = typed_frame(rows, [
+                'origin', 'destination', 'passengers', 'revenue', 'trips', 'seats_offered',
+                'seats_sold', 'trip_revenue'
+            ], ROUTE_DTYPES)
+            seats = routes['seats_offered'].where(routes['seats_offered'] > 0)
+            return routes.assign(
+                average_fare=(routes['revenue'] / routes['passengers'].where(routes['passengers'] > 0)).round(2),
+                revenue_per_seat=(routes['trip_revenue'] / seats).round(2),
+                load_factor=(routes['seats_sold'] / seats).round(3)
+            ).drop(columns='trip_revenue')
+        except Exception as e:
+            raise Exception(f"Error calculating route matrix: {str(e)}")
\ No newline at end of file
@@ -1,16 +1,145 @@
 import os
-import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, Boolean
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, DateTime, Time, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
 from datetime import datetime
+import instrumentation
 
-# Get database URL from environment
-DATABASE_URL = os.getenv('DATABASE_URL')
+# Get database URL from environment; without one the app runs on an embedded SQLite file
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///matrack.db')
 
-# Create SQLAlchemy engine and session
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool settings, shared by every session in the process
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+class PoolStats:
+    """Thread-safe counters for connection checkouts and time spent waiting on the pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(1000 * self.total_wait / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(1000 * self.max_wait, 3)
+            }
+
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - started)
+        return connection
+
+# Pragmas applied to every SQLite connection: WAL lets readers run alongside the
+# single writer, and NORMAL sync is durable across application crashes in WAL mode
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'cache_size': -int(os.getenv('SQLITE_CACHE_KB', '65536')),
+    'temp_store': 'MEMORY',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_BYTES', str(256 * 1024 * 1024)))
+}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # pysqlite only opens a transaction before a write, so a SAVEPOINT could start
+    # one and its RELEASE commit early. Turn that off and emit BEGIN in _begin_sqlite
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _begin_sqlite(conn):
+    # Migrations that ask for AUTOCOMMIT run each statement on its own
+    if conn.get_execution_options().get('isolation_level') != 'AUTOCOMMIT':
+        conn.exec_driver_sql("BEGIN")
+
+def build_engine(url):
+    """Create an engine with the shared pool settings and backend-specific tuning"""
+    pool_options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': POOL_SIZE,
+        'max_overflow': MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'pool_recycle': POOL_RECYCLE,
+        'pool_pre_ping': POOL_PRE_PING
+    }
+    if make_url(url).get_backend_name() != 'sqlite':
+        return create_engine(url, **pool_options)
+
+    # Streamlit serves each session on its own thread, so pooled connections move between threads
+    connect_args = {'check_same_thread': False}
+    if make_url(url).database in (None, '', ':memory:'):
+        # An in-memory database only exists on the connection that created it
+        sqlite_engine = create_engine(url, poolclass=StaticPool, connect_args=connect_args)
+    else:
+        sqlite_engine = create_engine(url, connect_args=connect_args, **pool_options)
+    event.listen(sqlite_engine, 'connect', _set_sqlite_pragmas)
+    event.listen(sqlite_engine, 'begin', _begin_sqlite)
+    return sqlite_engine
+
+# One SQLAlchemy engine per process, created on first use so importing the
+# models (e.g. for the login page) doesn't pay for driver imports and pool setup
+_engine = None
+_engine_lock = threading.Lock()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+def get_engine():
+    """Get the process-wide engine, creating it and binding SessionLocal on first call"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                new_engine = build_engine(DATABASE_URL)
+                instrumentation.install(new_engine)
+                SessionLocal.configure(bind=new_engine)
+                _engine = new_engine
+    return _engine
+
+def __getattr__(name):
+    # Keeps `from database import engine` working without creating it at import time
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Create declarative base
 Base = declarative_base()
@@ -26,6 +155,7 @@ class User(Base):
     google_id = Column(String, unique=True)
     passengers = relationship("Passenger", back_populates="owner")
     expenses = relationship("Expense", back_populates="owner")
+    trips = relationship("Trip", back_populates="owner")
 
 class Passenger(Base):
     __tablename__ = "passengers"
@@ -37,16 +167,87 @@ class Passenger(Base):
     journeys = relationship("Journey", back_populates="passenger")
     owner = relationship("User", back_populates="passengers")
 
+    __table_args__ = (
+        # Phones are stored normalized, so this also stops "0712 345" and "0712345" splitting a rider
+        Index(
+            "ux_passengers_owner_phone", "owner_id", "phone", unique=True,
+            info={"used_by": [
+                "passengers.passenger_ids",
+                "DataManager.get_passenger_journeys",
+                "DataManager.get_journey_feed",
+                "rollups.rebuild_daily_stats",
+            ]}
+        ),
+    )
+
+class Place(Base):
+    """Dictionary of place names; key is the normalized name that lookups match on"""
+    __tablename__ = "places"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+
+# Seats on a standard matatu
+DEFAULT_TRIP_CAPACITY = 11
+
+class Trip(Base):
+    """One vehicle run; seats_sold and revenue are kept in step with its journeys"""
+    __tablename__ = "trips"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    vehicle = Column(String)
+    trip_date = Column(Date, nullable=False)
+    departure_time = Column(Time)
+    origin_id = Column(Integer, ForeignKey("places.id"), nullable=False)
+    destination_id = Column(Integer, ForeignKey("places.id"), nullable=False)
+    fare = Column(Float, nullable=False)
+    capacity = Column(Integer, nullable=False, default=DEFAULT_TRIP_CAPACITY)
+    seats_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    owner = relationship("User", back_populates="trips")
+    journeys = relationship("Journey", back_populates="trip")
+
+    __table_args__ = (
+        # Per-trip occupancy and revenue are read straight from the index on Postgres
+        Index(
+            "ix_trips_owner_date", "owner_id", "trip_date",
+            postgresql_include=["capacity", "seats_sold", "revenue"],
+            info={"used_by": [
+                "DataManager.get_trip_summary",
+                "rollups.rebuild_daily_stats",
+            ]}
+        ),
+    )
+
 class Journey(Base):
     __tablename__ = "journeys"
 
     id = Column(Integer, primary_key=True, index=True)
     passenger_id = Column(Integer, ForeignKey("passengers.id"))
-    origin = Column(String, nullable=False)
-    destination = Column(String, nullable=False)
+    # Journeys recorded before trips existed, or entered one by one, have no trip
+    trip_id = Column(Integer, ForeignKey("trips.id"))
+    origin_id = Column(Integer, ForeignKey("places.id"), nullable=False)
+    destination_id = Column(Integer, ForeignKey("places.id"), nullable=False)
     fare = Column(Float, nullable=False)
     journey_date = Column(Date, nullable=False)
     passenger = relationship("Passenger", back_populates="journeys")
+    trip = relationship("Trip", back_populates="journeys")
+
+    __table_args__ = (
+        Index("ix_journeys_trip", "trip_id", info={"used_by": ["DataManager.get_trip_passengers"]}),
+        # Covers the fare sums in reports without touching the heap on Postgres
+        Index(
+            "ix_journeys_passenger_date", "passenger_id", "journey_date",
+            postgresql_include=["fare"],
+            info={"used_by": [
+                "DataManager.get_passenger_journeys",
+                "DataManager.get_journey_feed",
+                "rollups.rebuild_daily_stats",
+            ]}
+        ),
+    )
 
 class Expense(Base):
     __tablename__ = "expenses"
@@ -59,12 +260,140 @@ class Expense(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="expenses")
 
+    __table_args__ = (
+        # Covers the amount sums and type breakdowns without touching the heap on Postgres
+        Index(
+            "ix_expenses_owner_date", "owner_id", "date",
+            postgresql_include=["amount", "expense_type"],
+            info={"used_by": [
+                "DataManager.get_expenses",
+                "DataManager.get_expense_feed",
+                "rollups.rebuild_daily_stats",
+            ]}
+        ),
+    )
+
+class DailyOwnerStats(Base):
+    """Per-owner, per-day totals kept in step with journeys and expenses"""
+    __tablename__ = "daily_owner_stats"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    passenger_count = Column(Integer, nullable=False, default=0)
+    trip_count = Column(Integer, nullable=False, default=0)
+    expenses = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        {"info": {"used_by": [
+            "DataManager.get_financial_summary",
+            "DataManager.get_revenue_by_period",
+            "DataManager.get_performance_metrics",
+        ]}},
+    )
+
+class DailyOwnerExpense(Base):
+    """Per-owner, per-day expense totals by expense type"""
+    __tablename__ = "daily_owner_expenses"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    expense_type = Column(String, primary_key=True)
+    amount = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        {"info": {"used_by": [
+            "DataManager.get_expense_breakdown",
+        ]}},
+    )
+
+class DailyRouteStats(Base):
+    """Per-owner, per-day totals for each origin and destination pair"""
+    __tablename__ = "daily_route_stats"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    origin_id = Column(Integer, ForeignKey("places.id"), primary_key=True)
+    destination_id = Column(Integer, ForeignKey("places.id"), primary_key=True)
+    passenger_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    trip_count = Column(Integer, nullable=False, default=0)
+    seats_offered = Column(Integer, nullable=False, default=0)
+    # Seats sold and revenue on the day's trips, the counterparts of seats_offered
+    seats_sold = Column(Integer, nullable=False, default=0)
+    trip_revenue = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        {"info": {"used_by": [
+            "DataManager.get_route_matrix",
+        ]}},
+    )
+
+class PeriodViewRefresh(Base):
+    """When the weekly and monthly period views were last recomputed"""
+    __tablename__ = "period_view_refreshes"
+
+    name = Column(String, primary_key=True)
+    refreshed_on = Column(Date, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+
+class PeriodViewStale(Base):
+    """Earliest day per owner changed in an already closed period since the last refresh"""
+    __tablename__ = "period_view_stale"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    stale_from = Column(Date, nullable=False)
+
+class AppliedWrite(Base):
+    """Idempotency keys of journaled writes already applied, so a replay skips them"""
+    __tablename__ = "applied_writes"
+
+    key = Column(String, primary_key=True)
+    applied_at = Column(DateTime, nullable=False)
+
+class ReplicaHeartbeat(Base):
+    """Timestamp written to the primary every few seconds; its age on a replica is the replica's lag"""
+    __tablename__ = "replica_heartbeat"
+
+    name = Column(String, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)
+
 def init_db():
     """Initialize the database tables"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+
+@contextmanager
+def session_scope():
+    """Provide a short-lived session that commits on success and rolls back on error"""
+    get_engine()
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def get_pool_stats():
+    """Get current connection pool usage and checkout wait statistics"""
+    pool = get_engine().pool
+    if not isinstance(pool, QueuePool):
+        return {'pool_size': 1, 'checked_out': 0, 'checked_in': 1, 'overflow': 0, 'max_overflow': 0}
+    stats = {
+        'pool_size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': MAX_OVERFLOW
+    }
+    stats.update(pool_stats.snapshot())
+    return stats
 
 def get_db():
     """Get database session"""
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,158 @@
+"""Streaming export of journeys and expenses to CSV or Parquet.
+
+Rows are read with a server-side cursor and written one batch at a time, so
+peak memory depends on the batch size rather than on the number of rows
+exported. Parquet output needs the optional pyarrow package.
+
+Usage:
+    python exporter.py journeys journeys_2025.csv --start 2025-01-01 --end 2025-12-31
+    python exporter.py expenses expenses.parquet --owner-email owner@example.com
+"""
+import argparse
+import csv
+from datetime import date
+from sqlalchemy import select
+from database import session_scope, Passenger, Journey, Expense
+from places import OriginPlace, DestinationPlace
+
+DEFAULT_BATCH_SIZE = 5000
+
+FORMATS = ['csv', 'parquet']
+
+def _journey_query(owner_id, start_date, end_date):
+    query = select(
+        Journey.journey_date,
+        Passenger.name,
+        Passenger.phone,
+        OriginPlace.name.label('origin'),
+        DestinationPlace.name.label('destination'),
+        Journey.fare
+    ).join(Passenger).join(OriginPlace, Journey.origin_id == OriginPlace.id).join(
+        DestinationPlace, Journey.destination_id == DestinationPlace.id
+    )
+    if owner_id is not None:
+        query = query.where(Passenger.owner_id == owner_id)
+    if start_date is not None:
+        query = query.where(Journey.journey_date >= start_date)
+    if end_date is not None:
+        query = query.where(Journey.journey_date <= end_date)
+    return query.order_by(Journey.journey_date, Journey.id)
+
+def _expense_query(owner_id, start_date, end_date):
+    query = select(
+        Expense.expense_type,
+        Expense.amount,
+        Expense.date,
+        Expense.notes
+    )
+    if owner_id is not None:
+        query = query.where(Expense.owner_id == owner_id)
+    if start_date is not None:
+        query = query.where(Expense.date >= start_date)
+    if end_date is not None:
+        query = query.where(Expense.date <= end_date)
+    return query.order_by(Expense.date, Expense.id)
+
+def _parquet_schema(kind):
+    import pyarrow as pa
+
+    if kind == 'journeys':
+        return pa.schema([
+            ('journey_date', pa.date32()),
+            ('name', pa.string()),
+            ('phone', pa.string()),
+            ('origin', pa.string()),
+            ('destination', pa.string()),
+            ('fare', pa.float64())
+        ])
+    return pa.schema([
+        ('expense_type', pa.string()),
+        ('amount', pa.float64()),
+        ('date', pa.date32()),
+        ('notes', pa.string())
+    ])
+
+def _write_csv(target, columns, batches):
+    writer = csv.writer(target)
+    writer.writerow(columns)
+    rows = 0
+    for batch in batches:
+        writer.writerows(batch)
+        rows += len(batch)
+    return rows
+
+def _write_parquet(target, kind, columns, batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Parquet export requires the pyarrow package")
+
+    schema = _parquet_schema(kind)
+    rows = 0
+    with pq.ParquetWriter(target, schema) as writer:
+        for batch in batches:
+            arrays = [list(column) for column in zip(*batch)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    return rows
+
+def export_data(kind, target, owner_id=None, start_date=None, end_date=None,
+                fmt='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Stream journeys or expenses to target and return the number of rows written.
+
+    target is a text stream for CSV and a path or binary stream for Parquet.
+    owner_id, start_date and end_date are optional filters.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    query = _journey_query(owner_id, start_date, end_date) if kind == 'journeys' \
+        else _expense_query(owner_id, start_date, end_date)
+    columns = [c.name for c in query.selected_columns]
+
+    try:
+        with session_scope() as db:
+            result = db.execute(query.execution_options(yield_per=batch_size))
+            batches = (list(map(tuple, partition)) for partition in result.partitions())
+            if fmt == 'csv':
+                return _write_csv(target, columns, batches)
+            return _write_parquet(target, kind, columns, batches)
+    except Exception as e:
+        raise Exception(f"Error exporting {kind}: {str(e)}")
+
+def export_journeys(target, owner_id=None, start_date=None, end_date=None, fmt='csv',
+                    batch_size=DEFAULT_BATCH_SIZE):
+    """Stream passenger journeys to target"""
+    return export_data('journeys', target, owner_id, start_date, end_date, fmt, batch_size)
+
+def export_expenses(target, owner_id=None, start_date=None, end_date=None, fmt='csv',
+                    batch_size=DEFAULT_BATCH_SIZE):
+    """Stream expenses to target"""
+    return export_data('expenses', target, owner_id, start_date, end_date, fmt, batch_size)
+
+def main():
+    from importer import owner_id_for_email
+
+    parser = argparse.ArgumentParser(description="Export journeys or expenses to CSV or Parquet")
+    parser.add_argument("kind", choices=["journeys", "expenses"])
+    parser.add_argument("path", help="Output file; .parquet selects Parquet unless --format is given")
+    parser.add_argument("--owner-email", help="Only export this owner's data")
+    parser.add_argument("--start", type=date.fromisoformat, help="First date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last date to include (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.path.endswith('.parquet') else 'csv')
+    owner_id = owner_id_for_email(args.owner_email) if args.owner_email else None
+
+    if fmt == 'csv':
+        with open(args.path, 'w', newline='', encoding='utf-8') as target:
+            rows = export_data(args.kind, target, owner_id, args.start, args.end, fmt, args.batch_size)
+    else:
+        rows = export_data(args.kind, args.path, owner_id, args.start, args.end, fmt, args.batch_size)
+    print(f"Exported {rows} {args.kind} to {args.path}")
+
+if __name__ == "__main__":
+    main()
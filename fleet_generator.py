@@ -0,0 +1,184 @@
+"""Seeded synthetic fleet data for benchmarks and load testing.
+
+Creates owners, each with a pool of repeat passengers, trips of up to eleven
+passengers on weighted routes (with their vehicle and departure time) out of a few hubs, and a running stream of fuel,
+maintenance, insurance and other expenses. Dates are spread over the requested
+span with busier Fridays and Sundays and a December peak. The same seed and
+end date always produce the same data.
+
+Usage:
+    python fleet_generator.py --owners 5 --passengers 2000 --journeys 100000 --expenses 2000
+"""
+import argparse
+import random
+from datetime import date, time, timedelta
+from sqlalchemy import insert, func, select
+from database import session_scope, User, Passenger, Journey, Expense, Trip, DEFAULT_TRIP_CAPACITY
+from migrations import upgrade
+from importer import bulk_insert
+from rollups import rebuild_daily_stats
+from period_views import refresh_period_views
+from places import place_ids
+
+# (origin, destination, fare, relative popularity)
+ROUTES = [
+    ('Nairobi', 'Kisii', 1600.0, 20),
+    ('Nairobi', 'Kisumu', 1500.0, 18),
+    ('Nairobi', 'Bondo', 1000.0, 8),
+    ('Nairobi', 'Nakuru', 600.0, 25),
+    ('Nairobi', 'Eldoret', 1200.0, 12),
+    ('Nairobi', 'Mombasa', 2000.0, 15),
+    ('Nakuru', 'Eldoret', 700.0, 6),
+    ('Kisumu', 'Bondo', 400.0, 5),
+    ('Kisii', 'Kisumu', 500.0, 5),
+    ('Mombasa', 'Malindi', 800.0, 4),
+]
+# Return legs are as common as outbound ones
+ROUTES += [(d, o, fare, weight) for o, d, fare, weight in ROUTES]
+
+EXPENSE_PROFILE = [
+    # (expense_type, share of expenses, low amount, high amount)
+    ('Fuel', 0.70, 3000.0, 9000.0),
+    ('Maintenance', 0.18, 2000.0, 25000.0),
+    ('Insurance', 0.02, 40000.0, 90000.0),
+    ('Other', 0.10, 200.0, 3000.0),
+]
+
+FIRST_NAMES = ['Samson', 'Achieng', 'Otieno', 'Wanjiku', 'Kamau', 'Njeri', 'Omollo', 'Atieno',
+               'Mwangi', 'Chebet', 'Kiprop', 'Akinyi', 'Mutua', 'Wambui', 'Onyango', 'Nyambura']
+
+VEHICLES_PER_OWNER = 4
+BATCH_SIZE = 10000
+
+def _cumulative_day_weights(start_date, days):
+    """Cumulative weight of each day: busier Fridays and Sundays, and a December peak"""
+    weights = []
+    total = 0.0
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        weight = 1.0
+        if day.weekday() in (4, 6):
+            weight *= 1.6
+        if day.month == 12:
+            weight *= 1.5
+        total += weight
+        weights.append(total)
+    return weights
+
+def _phone(rng, used):
+    while True:
+        phone = '07' + ''.join(rng.choice('0123456789') for _ in range(8))
+        if phone not in used:
+            used.add(phone)
+            return phone
+
+def generate(owners=3, passengers=500, journeys=10000, expenses=500, days=365,
+             end_date=None, seed=42):
+    """Fill the schema with synthetic data; counts are per owner. Returns the new owner ids."""
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    day_offsets = range(days)
+    day_weights = _cumulative_day_weights(start_date, days)
+    route_weights = [r[3] for r in ROUTES]
+    expense_weights = [e[1] for e in EXPENSE_PROFILE]
+
+    upgrade()
+    owner_ids = []
+    with session_scope() as db:
+        ids_by_place = place_ids(db, [name for route in ROUTES for name in route[:2]])
+        run = db.execute(select(func.count(User.id))).scalar()
+        for n in range(owners):
+            owner_ids.append(db.execute(insert(User).returning(User.id), {
+                'email': f'fleet{run + n}.{seed}@example.com',
+                'name': f'Fleet Owner {run + n}',
+                'is_google_auth': False
+            }).scalar_one())
+
+    used_phones = set()
+    for owner_id in owner_ids:
+        with session_scope() as db:
+            passenger_ids = [row.id for row in db.execute(
+                insert(Passenger).returning(Passenger.id),
+                [{
+                    'name': rng.choice(FIRST_NAMES),
+                    'phone': _phone(rng, used_phones),
+                    'owner_id': owner_id
+                } for _ in range(passengers)]
+            )]
+
+        # A few regulars ride far more often than everyone else
+        rider_weights = []
+        total = 0.0
+        for rank in range(len(passenger_ids)):
+            total += 1.0 / (rank + 1) ** 0.8
+            rider_weights.append(total)
+
+        vehicles = [f'K{chr(65 + owner_id % 26)}{chr(65 + n)} {rng.randint(100, 999)}{chr(65 + n)}'
+                    for n in range(VEHICLES_PER_OWNER)]
+        remaining = journeys
+        trips, riders_by_trip, batch_size = [], [], 0
+        while remaining > 0:
+            day = start_date + timedelta(days=rng.choices(day_offsets, cum_weights=day_weights)[0])
+            origin, destination, fare, _ = rng.choices(ROUTES, route_weights)[0]
+            seats = min(remaining, rng.randint(DEFAULT_TRIP_CAPACITY // 2, DEFAULT_TRIP_CAPACITY))
+            riders = set(rng.choices(passenger_ids, cum_weights=rider_weights, k=seats))
+            trips.append({
+                'owner_id': owner_id,
+                'vehicle': rng.choice(vehicles),
+                'trip_date': day,
+                'departure_time': time(rng.randint(5, 20), rng.choice((0, 15, 30, 45))),
+                'origin_id': ids_by_place[origin],
+                'destination_id': ids_by_place[destination],
+                'fare': fare,
+                'capacity': DEFAULT_TRIP_CAPACITY,
+                'seats_sold': len(riders),
+                'revenue': fare * len(riders)
+            })
+            riders_by_trip.append(riders)
+            batch_size += len(riders)
+            remaining -= len(riders)
+            if batch_size >= BATCH_SIZE or remaining <= 0:
+                with session_scope() as db:
+                    trip_ids = db.execute(
+                        insert(Trip).returning(Trip.id, sort_by_parameter_order=True), trips
+                    ).scalars().all()
+                    bulk_insert(db, Journey.__table__,
+                                ['passenger_id', 'trip_id', 'origin_id', 'destination_id', 'fare', 'journey_date'],
+                                [(pid, trip_id, trip['origin_id'], trip['destination_id'], trip['fare'],
+                                  trip['trip_date'])
+                                 for trip_id, trip, riders in zip(trip_ids, trips, riders_by_trip)
+                                 for pid in riders])
+                trips, riders_by_trip, batch_size = [], [], 0
+
+        expense_rows = []
+        for _ in range(expenses):
+            expense_type, _, low, high = rng.choices(EXPENSE_PROFILE, expense_weights)[0]
+            day = start_date + timedelta(days=rng.randrange(days))
+            expense_rows.append((expense_type, round(rng.uniform(low, high), 2), day, None, owner_id))
+        with session_scope() as db:
+            bulk_insert(db, Expense.__table__,
+                        ['expense_type', 'amount', 'date', 'notes', 'owner_id'], expense_rows)
+
+        with session_scope() as db:
+            rebuild_daily_stats(db, owner_id)
+
+    refresh_period_views()
+    return owner_ids
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic fleet data")
+    parser.add_argument("--owners", type=int, default=3)
+    parser.add_argument("--passengers", type=int, default=500, help="Passengers per owner")
+    parser.add_argument("--journeys", type=int, default=10000, help="Journeys per owner")
+    parser.add_argument("--expenses", type=int, default=500, help="Expenses per owner")
+    parser.add_argument("--days", type=int, default=365, help="Days of history ending today")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    owner_ids = generate(args.owners, args.passengers, args.journeys, args.expenses,
+                         args.days, seed=args.seed)
+    print(f"Generated data for owners {owner_ids}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Process-wide cache of Google's ID token signing certificates.
+
+Certificates are fetched over one reused HTTP session and kept until the
+Cache-Control max-age of the response runs out, so verifying a token is a
+local signature check. Shortly before expiry the certificates are refreshed
+on a background thread while the current ones keep serving logins; a token
+signed with an unknown key id triggers an immediate refresh (at most once per
+GOOGLE_CERTS_MIN_REFRESH seconds, so forged key ids can't hammer Google).
+
+GOOGLE_CERTS_URL points the cache at another endpoint, such as a local stand-in
+serving {"key id": "PEM certificate"} for tests.
+"""
+import base64
+import json
+import os
+import re
+import threading
+import time
+import requests as http
+from google.auth import exceptions, jwt
+from google.auth.transport import requests as google_requests
+
+GOOGLE_CERTS_URL = os.getenv('GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+# Used when the response carries no usable Cache-Control max-age
+GOOGLE_CERTS_DEFAULT_TTL = float(os.getenv('GOOGLE_CERTS_DEFAULT_TTL', '3600'))
+# Refresh in the background once this many seconds remain before expiry
+GOOGLE_CERTS_REFRESH_MARGIN = float(os.getenv('GOOGLE_CERTS_REFRESH_MARGIN', '300'))
+GOOGLE_CERTS_MIN_REFRESH = float(os.getenv('GOOGLE_CERTS_MIN_REFRESH', '60'))
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+def _cache_lifetime(headers):
+    """Seconds the response may be cached for, from Cache-Control and Age"""
+    match = _MAX_AGE.search(headers.get('Cache-Control', ''))
+    if not match:
+        return GOOGLE_CERTS_DEFAULT_TTL
+    try:
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+def _token_key_id(token):
+    """Read the key id from a JWT header without verifying anything"""
+    if isinstance(token, str):
+        token = token.encode()
+    header = token.split(b'.')[0]
+    header += b'=' * (-len(header) % 4)
+    try:
+        return json.loads(base64.urlsafe_b64decode(header)).get('kid')
+    except ValueError:
+        return None
+
+class GoogleCertCache:
+    """Thread-safe certificate cache with background and key-miss refresh"""
+
+    def __init__(self, certs_url=GOOGLE_CERTS_URL, request=None):
+        self.certs_url = certs_url
+        # One session so connections to the certs endpoint are kept alive
+        self.request = request or google_requests.Request(session=http.Session())
+        self._certs = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self):
+        response = self.request(self.certs_url, method='GET')
+        if response.status != 200:
+            raise exceptions.TransportError(f"Could not fetch certificates at {self.certs_url}")
+        certs = json.loads(response.data.decode('utf-8'))
+        with self._lock:
+            self._certs = certs
+            self._fetched_at = time.monotonic()
+            self._expires_at = self._fetched_at + _cache_lifetime(response.headers)
+        return certs
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+        except Exception:
+            # Keep serving the current certificates; the next lookup retries
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get_certs(self, key_id=None):
+        """Get the current certificates, refreshing them when needed"""
+        now = time.monotonic()
+        with self._lock:
+            certs, expires_at = self._certs, self._expires_at
+            missing_key = key_id is not None and key_id not in certs
+            fetch_now = not certs or now >= expires_at or (
+                missing_key and now - self._last_fetch >= GOOGLE_CERTS_MIN_REFRESH)
+            if fetch_now:
+                self._last_fetch = now
+            elif now >= expires_at - GOOGLE_CERTS_REFRESH_MARGIN and not self._refreshing:
+                self._refreshing = True
+                self._last_fetch = now
+                threading.Thread(target=self._background_refresh, daemon=True).start()
+
+        if fetch_now:
+            with self._fetch_lock:
+                with self._lock:
+                    # Another thread fetched while this one waited
+                    if self._fetched_at > now:
+                        return self._certs
+                return self._fetch()
+        return certs
+
+    def verify_token(self, token, audience=None, clock_skew_in_seconds=0):
+        """Verify a Google ID token locally against the cached certificates"""
+        certs = self.get_certs(_token_key_id(token))
+        idinfo = jwt.decode(token, certs=certs, audience=audience,
+                            clock_skew_in_seconds=clock_skew_in_seconds)
+        if idinfo['iss'] not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError(f"Wrong issuer. 'iss' should be one of {GOOGLE_ISSUERS}")
+        return idinfo
+
+# Process-wide cache shared by every session
+google_certs = GoogleCertCache()
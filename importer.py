@@ -0,0 +1,232 @@
+"""Streaming bulk import of journeys and expenses from CSV files.
+
+Files are read in chunks so memory use does not grow with file size. Every
+row is validated before loading, rows that fail validation are reported with
+their line number, and each chunk is written in its own transaction using
+Postgres COPY when available and a multi-row executemany insert otherwise,
+together with the matching daily rollup updates. Imported journeys of one
+day, route and fare are grouped into trips of at most the default capacity
+within each chunk.
+
+Usage:
+    python importer.py journeys data/passengers.csv --owner-email owner@example.com
+    python importer.py expenses data/expenses.csv --owner-email owner@example.com
+"""
+import argparse
+import csv
+import io
+import math
+from collections import defaultdict
+from datetime import date
+from itertools import islice
+from sqlalchemy import insert
+from database import session_scope, User, Journey, Expense, Trip, DEFAULT_TRIP_CAPACITY
+from passengers import passenger_ids, normalize_phone
+from places import place_ids
+from report_cache import report_cache
+from read_replica import replica_router
+from period_views import period_refresher, refresh_period_views
+from rollups import add_journey_stats, add_expense_stats, add_route_stats
+from utils import validate_phone
+
+DEFAULT_CHUNK_SIZE = 5000
+
+JOURNEY_COLUMNS = ['name', 'phone', 'origin', 'destination', 'fare', 'journey_date']
+EXPENSE_COLUMNS = ['expense_type', 'amount', 'date', 'notes']
+
+def _parse_date(value):
+    return date.fromisoformat(value.strip())
+
+def _parse_amount(value, field, allow_zero):
+    amount = float(value)
+    # float() also accepts nan and inf, which would poison the rollup sums
+    if not math.isfinite(amount):
+        raise ValueError(f"{field} must be a number")
+    if amount < 0 or (amount == 0 and not allow_zero):
+        raise ValueError(f"{field} must be greater than {'or equal to ' if allow_zero else ''}0")
+    return amount
+
+def _validate_journey(row):
+    """Validate a journey CSV row and return it with typed values"""
+    name = (row.get('name') or '').strip()
+    phone = normalize_phone((row.get('phone') or '').strip())
+    origin = (row.get('origin') or '').strip()
+    destination = (row.get('destination') or '').strip()
+    if not name:
+        raise ValueError("Name is required")
+    if not validate_phone(phone):
+        raise ValueError(f"Invalid phone number format: {phone!r}")
+    if not origin or not destination:
+        raise ValueError("Origin and destination are required")
+    return {
+        'name': name,
+        'phone': phone,
+        'origin': origin,
+        'destination': destination,
+        'fare': _parse_amount(row.get('fare'), 'Fare', allow_zero=True),
+        'journey_date': _parse_date(row.get('journey_date'))
+    }
+
+def _validate_expense(row):
+    """Validate an expense CSV row and return it with typed values"""
+    expense_type = (row.get('expense_type') or '').strip()
+    if not expense_type:
+        raise ValueError("Expense type is required")
+    return {
+        'expense_type': expense_type,
+        'amount': _parse_amount(row.get('amount'), 'Amount', allow_zero=False),
+        'date': _parse_date(row.get('date')),
+        'notes': (row.get('notes') or '').strip() or None
+    }
+
+def bulk_insert(db, table, columns, records):
+    """Insert records (tuples in column order) with COPY on Postgres or executemany elsewhere"""
+    if not records:
+        return
+    dialect = db.get_bind().dialect
+    if dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+        cursor = db.connection().connection.dbapi_connection.cursor()
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            ['\\N' if v is None else v for v in record] for record in records
+        )
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+        cursor.close()
+    else:
+        db.execute(insert(table), [dict(zip(columns, record)) for record in records])
+
+def _load_journeys(db, owner_id, rows, capacity=DEFAULT_TRIP_CAPACITY):
+    ids_by_phone = passenger_ids(db, owner_id, rows)
+    ids_by_place = place_ids(db, [r[end] for r in rows for end in ('origin', 'destination')])
+
+    # Rows of one day, route and fare are one run, split into full trips in file
+    # order, the same grouping as rollups.backfill_trips
+    runs = defaultdict(list)
+    for r in rows:
+        runs[(r['journey_date'], ids_by_place[r['origin']], ids_by_place[r['destination']], r['fare'])].append(r)
+    trips = [(key, run[start:start + capacity])
+             for key, run in runs.items() for start in range(0, len(run), capacity)]
+    trip_ids = db.execute(insert(Trip).returning(Trip.id, sort_by_parameter_order=True), [{
+        'owner_id': owner_id, 'trip_date': day, 'origin_id': origin_id, 'destination_id': destination_id,
+        'fare': fare, 'capacity': capacity, 'seats_sold': len(riders), 'revenue': fare * len(riders)
+    } for (day, origin_id, destination_id, fare), riders in trips]).scalars().all()
+
+    columns = ['passenger_id', 'trip_id', 'origin_id', 'destination_id', 'fare', 'journey_date']
+    bulk_insert(db, Journey.__table__, columns, [
+        (ids_by_phone[r['phone']], trip_id, origin_id, destination_id, fare, day)
+        for trip_id, ((day, origin_id, destination_id, fare), riders) in zip(trip_ids, trips)
+        for r in riders
+    ])
+
+    day_totals = defaultdict(lambda: (0, 0.0))
+    trips_by_day = defaultdict(int)
+    route_totals = defaultdict(lambda: (0, 0.0, 0, 0, 0, 0.0))
+    for (day, origin_id, destination_id, fare), riders in trips:
+        passengers, revenue = day_totals[day]
+        day_totals[day] = (passengers + len(riders), revenue + fare * len(riders))
+        trips_by_day[day] += 1
+        route = (day, origin_id, destination_id)
+        passengers, revenue, trip_count, seats, sold, trip_revenue = route_totals[route]
+        route_totals[route] = (
+            passengers + len(riders), revenue + fare * len(riders), trip_count + 1, seats + capacity,
+            sold + len(riders), trip_revenue + fare * len(riders)
+        )
+    add_journey_stats(db, owner_id, day_totals, new_trips=trips_by_day)
+    add_route_stats(db, owner_id, route_totals)
+
+def _load_expenses(db, owner_id, rows):
+    columns = ['expense_type', 'amount', 'date', 'notes', 'owner_id']
+    bulk_insert(db, Expense.__table__, columns, [
+        (r['expense_type'], r['amount'], r['date'], r['notes'], owner_id)
+        for r in rows
+    ])
+    add_expense_stats(db, owner_id, [(r['date'], r['expense_type'], r['amount']) for r in rows])
+
+def _import_csv(source, owner_id, required_columns, validate, load, chunk_size):
+    """Stream a CSV file through validate and load one chunk at a time.
+
+    Returns a dict with rows_read, rows_imported and a list of
+    (line_number, message) errors.
+    """
+    result = {'rows_read': 0, 'rows_imported': 0, 'errors': []}
+    reader = csv.DictReader(source)
+
+    missing = [c for c in required_columns if c not in (reader.fieldnames or [])]
+    if missing:
+        result['errors'].append((1, f"Missing columns: {', '.join(missing)}"))
+        return result
+
+    numbered_rows = ((reader.line_num, row) for row in reader)
+    while True:
+        chunk = list(islice(numbered_rows, chunk_size))
+        if not chunk:
+            break
+
+        valid = []
+        for line, row in chunk:
+            result['rows_read'] += 1
+            try:
+                if None in row:
+                    raise ValueError("Row has more fields than the header")
+                valid.append(validate(row))
+            except (TypeError, ValueError) as e:
+                result['errors'].append((line, str(e)))
+
+        if not valid:
+            continue
+        try:
+            with session_scope() as db:
+                load(db, owner_id, valid)
+            replica_router.record_write(owner_id)
+            report_cache.invalidate_owner(owner_id)
+            result['rows_imported'] += len(valid)
+        except Exception as e:
+            result['errors'].append((chunk[0][0], f"Chunk of {len(valid)} rows not imported: {str(e)}"))
+
+    if result['rows_imported']:
+        # Imports usually backfill closed weeks and months, which the period views then stop serving
+        period_refresher.request_refresh()
+    return result
+
+def import_journeys(source, owner_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import passenger journeys from a CSV text stream for an owner"""
+    return _import_csv(source, owner_id, JOURNEY_COLUMNS, _validate_journey, _load_journeys, chunk_size)
+
+def import_expenses(source, owner_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import expenses from a CSV text stream for an owner"""
+    return _import_csv(source, owner_id, EXPENSE_COLUMNS[:3], _validate_expense, _load_expenses, chunk_size)
+
+def owner_id_for_email(email):
+    """Look up a user's id by email"""
+    with session_scope() as db:
+        user = db.query(User.id).filter(User.email == email).first()
+        if not user:
+            raise Exception(f"No user registered with email {email}")
+        return user.id
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import journeys or expenses from CSV")
+    parser.add_argument("kind", choices=["journeys", "expenses"])
+    parser.add_argument("path", help="CSV file to import")
+    parser.add_argument("--owner-email", required=True, help="Email of the owner to import for")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    owner_id = owner_id_for_email(args.owner_email)
+    importer = import_journeys if args.kind == "journeys" else import_expenses
+    with open(args.path, newline='', encoding='utf-8-sig') as source:
+        result = importer(source, owner_id, chunk_size=args.chunk_size)
+    if result['rows_imported']:
+        refresh_period_views()
+
+    for line, message in result['errors']:
+        print(f"line {line}: {message}")
+    print(f"Imported {result['rows_imported']} of {result['rows_read']} rows "
+          f"({len(result['errors'])} errors)")
+
+if __name__ == "__main__":
+    main()
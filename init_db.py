@@ -1,5 +1,35 @@
-from database import init_db
+import argparse
+from migrations import upgrade, status, index_report, head_version
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the transport database schema")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="upgrade",
+        choices=["upgrade", "status", "indexes"],
+        help="upgrade: apply pending migrations (default); "
+             "status: list migrations; indexes: show indexes and the queries using them"
+    )
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade()
+        for migration in applied:
+            print(f"Applied migration {migration.version}: {migration.description}")
+        print(f"Database schema is up to date (version {head_version()})")
+    elif args.command == "status":
+        for version, description, applied_at in status():
+            state = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pending"
+            print(f"{version:>4}  {description:<50} {state}")
+    else:
+        for entry in index_report():
+            columns = ", ".join(entry["columns"])
+            include = f" INCLUDE ({', '.join(entry['include'])})" if entry["include"] else ""
+            state = "present" if entry["exists"] else "missing"
+            print(f"{entry['index']} on {entry['table']} ({columns}){include} [{state}]")
+            for query in entry["used_by"]:
+                print(f"    used by {query}")
 
 if __name__ == "__main__":
-    init_db()
-    print("Database tables created successfully!")
+    main()
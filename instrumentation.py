@@ -0,0 +1,169 @@
+"""Optional timing instrumentation for SQL statements, DataManager methods and pages.
+
+Enable with MATRACK_INSTRUMENTATION=1. When disabled nothing is registered:
+the decorators return the original functions, page timers are no-ops and no
+engine events are attached, so there is no runtime cost.
+
+When enabled, every SQL statement is timed through SQLAlchemy engine events
+and tagged with the DataManager method that issued it, together with the rows
+it returned or changed where the driver reports them. Method timings record
+how much of their time was spent in SQL, and page timings in app.py show what
+is left for DataFrame building and chart rendering. Statements slower than
+MATRACK_SLOW_QUERY_MS are logged to the matrack.slow_query logger.
+"""
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager, nullcontext
+from sqlalchemy import event
+
+INSTRUMENTATION_ENABLED = os.getenv('MATRACK_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('MATRACK_SLOW_QUERY_MS', '200'))
+SAMPLES_PER_KEY = int(os.getenv('MATRACK_TIMING_SAMPLES', '1000'))
+
+slow_query_logger = logging.getLogger('matrack.slow_query')
+
+# The traced call currently running on this thread, and its accumulated SQL time
+_current_method = contextvars.ContextVar('matrack_current_method', default=None)
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class TimingRegistry:
+    """Thread-safe store of recent timings per (kind, name)"""
+
+    def __init__(self, samples_per_key=SAMPLES_PER_KEY):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=samples_per_key))
+        self._sql_samples = defaultdict(lambda: deque(maxlen=samples_per_key))
+        self._row_samples = defaultdict(lambda: deque(maxlen=samples_per_key))
+        self._counts = defaultdict(int)
+        self.slow_queries = deque(maxlen=100)
+
+    def record(self, kind, name, elapsed_ms, sql_ms=None, rows=None):
+        with self._lock:
+            self._samples[(kind, name)].append(elapsed_ms)
+            self._counts[(kind, name)] += 1
+            if sql_ms is not None:
+                self._sql_samples[(kind, name)].append(sql_ms)
+            if rows is not None:
+                self._row_samples[(kind, name)].append(rows)
+
+    def record_slow_query(self, entry):
+        with self._lock:
+            self.slow_queries.append(entry)
+
+    def summary(self, kind):
+        """Get count, p50 and p95 per name for one kind of timing"""
+        with self._lock:
+            rows = []
+            for (row_kind, name), samples in self._samples.items():
+                if row_kind != kind or not samples:
+                    continue
+                row = {
+                    'name': name,
+                    'count': self._counts[(row_kind, name)],
+                    'p50_ms': round(_percentile(samples, 0.50), 2),
+                    'p95_ms': round(_percentile(samples, 0.95), 2)
+                }
+                sql_samples = self._sql_samples.get((row_kind, name))
+                if sql_samples:
+                    row['sql_p50_ms'] = round(_percentile(sql_samples, 0.50), 2)
+                    row['sql_p95_ms'] = round(_percentile(sql_samples, 0.95), 2)
+                row_samples = self._row_samples.get((row_kind, name))
+                if row_samples:
+                    row['rows_p50'] = _percentile(row_samples, 0.50)
+                    row['rows_p95'] = _percentile(row_samples, 0.95)
+                rows.append(row)
+            return sorted(rows, key=lambda r: r['p95_ms'], reverse=True)
+
+    def recent_slow_queries(self):
+        with self._lock:
+            return list(reversed(self.slow_queries))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._sql_samples.clear()
+            self._row_samples.clear()
+            self._counts.clear()
+            self.slow_queries.clear()
+
+timings = TimingRegistry()
+
+def traced(func):
+    """Time a DataManager method and tag the SQL it issues with its name"""
+    if not INSTRUMENTATION_ENABLED:
+        return func
+
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # SQL is tagged with the innermost traced call; callers also count it in their SQL time
+        parent = _current_method.get()
+        state = {'name': name, 'sql_ms': 0.0}
+        token = _current_method.set(state)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_method.reset(token)
+            if parent is not None:
+                parent['sql_ms'] += state['sql_ms']
+            timings.record('method', name, (time.perf_counter() - started) * 1000, state['sql_ms'])
+    return wrapper
+
+def page_timer(name):
+    """Context manager that times one page render in app.py"""
+    if not INSTRUMENTATION_ENABLED:
+        return nullcontext()
+    return _timed_page(name)
+
+@contextmanager
+def _timed_page(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record('page', name, (time.perf_counter() - started) * 1000)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._matrack_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._matrack_started) * 1000
+    state = _current_method.get()
+    method = state['name'] if state else 'untraced'
+    if state:
+        state['sql_ms'] += elapsed_ms
+    # rowcount is only meaningful for writes and for drivers that buffer SELECT results
+    # (psycopg2 does, sqlite3 reports -1); statements without one record no row sample
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    timings.record('sql', method, elapsed_ms, rows=rows)
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        entry = {
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': method,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'rows': rows,
+            'statement': ' '.join(statement.split())[:500]
+        }
+        timings.record_slow_query(entry)
+        slow_query_logger.warning(
+            "Slow query in %s: %.1f ms, rows=%s: %s",
+            method, elapsed_ms, rows, entry['statement']
+        )
+
+def install(engine):
+    """Attach statement timing hooks to an engine when instrumentation is enabled"""
+    if not INSTRUMENTATION_ENABLED:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,290 @@
+"""Versioned schema migrations.
+
+Each migration has a version number and an upgrade function that receives a
+connection. Migrations marked non-transactional run in autocommit mode so that
+Postgres can build indexes with CREATE INDEX CONCURRENTLY on a live database
+without blocking writes. Every step is written to be safe to re-run.
+"""
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, inspect, select, text
+from database import get_engine, Base
+
+Migration = namedtuple("Migration", ["version", "description", "upgrade", "transactional"])
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def create_index(conn, name, table, columns, include=None, unique=False):
+    """Create an index if it does not exist, without blocking writes on Postgres"""
+    quote = conn.dialect.identifier_preparer.quote
+    column_sql = ", ".join(quote(c) for c in columns)
+    unique_sql = "UNIQUE " if unique else ""
+
+    if conn.dialect.name == "postgresql":
+        # A failed concurrent build leaves an invalid index behind; drop it so it is rebuilt
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(name)}"))
+
+        include_sql = f" INCLUDE ({', '.join(quote(c) for c in include)})" if include else ""
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} "
+            f"ON {quote(table)} ({column_sql}){include_sql}"
+        ))
+    else:
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} ({column_sql})"
+        ))
+
+def _column_names(conn, table):
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+def _add_report_indexes(conn):
+    create_index(conn, "ix_passengers_owner_phone", "passengers", ["owner_id", "phone"])
+    create_index(conn, "ix_journeys_passenger_date", "journeys", ["passenger_id", "journey_date"],
+                 include=["fare"])
+    create_index(conn, "ix_expenses_owner_date", "expenses", ["owner_id", "date"],
+                 include=["amount", "expense_type"])
+
+def _add_daily_rollups(conn):
+    from database import DailyOwnerStats, DailyOwnerExpense
+    from rollups import rebuild_daily_stats
+    from sqlalchemy.orm import Session
+
+    DailyOwnerStats.__table__.create(bind=conn, checkfirst=True)
+    DailyOwnerExpense.__table__.create(bind=conn, checkfirst=True)
+    # The rebuild reads journeys.trip_id and origin_id; older databases rebuild in migrations 3 and 4
+    if {"trip_id", "origin_id"} <= _column_names(conn, "journeys"):
+        rebuild_daily_stats(Session(bind=conn))
+
+def _add_trips(conn):
+    from database import Trip
+    from rollups import backfill_trips, rebuild_daily_stats
+    from sqlalchemy.orm import Session
+
+    Trip.__table__.create(bind=conn, checkfirst=True)
+    if "trip_id" not in _column_names(conn, "journeys"):
+        conn.execute(text("ALTER TABLE journeys ADD COLUMN trip_id INTEGER REFERENCES trips (id)"))
+    create_index(conn, "ix_journeys_trip", "journeys", ["trip_id"])
+
+    # Turn history into trips so trip counts stop being one per day. Grouping
+    # needs place ids, so databases still storing place names do it in migration 4.
+    if "origin_id" in _column_names(conn, "journeys"):
+        db = Session(bind=conn)
+        backfill_trips(db)
+        rebuild_daily_stats(db)
+
+def _add_places(conn):
+    from database import Place
+    from places import place_ids
+    from rollups import backfill_trips, rebuild_daily_stats
+    from sqlalchemy.orm import Session
+
+    Place.__table__.create(bind=conn, checkfirst=True)
+    tables = [t for t in ("journeys", "trips") if "origin" in _column_names(conn, t)]
+    if not tables:
+        return
+
+    names = set()
+    for table in tables:
+        for end in ("origin", "destination"):
+            names.update(conn.execute(text(f"SELECT DISTINCT {end} FROM {table}")).scalars())
+    db = Session(bind=conn)
+    # Blank names can't be normalized; they become an "Unknown" place
+    valid = [n for n in names if n and n.strip()]
+    ids_by_name = place_ids(db, valid + (["Unknown"] if len(valid) < len(names) else []))
+
+    conn.execute(text("CREATE TEMPORARY TABLE place_aliases (raw VARCHAR PRIMARY KEY, place_id INTEGER NOT NULL)"))
+    conn.execute(text("INSERT INTO place_aliases (raw, place_id) VALUES (:raw, :place_id)"), [
+        {"raw": name, "place_id": ids_by_name[name if name and name.strip() else "Unknown"]}
+        for name in names if name is not None
+    ])
+
+    for table in tables:
+        columns = _column_names(conn, table)
+        for end in ("origin", "destination"):
+            if f"{end}_id" not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {end}_id INTEGER REFERENCES places (id)"))
+            conn.execute(text(
+                f"UPDATE {table} SET {end}_id = "
+                f"(SELECT place_id FROM place_aliases WHERE place_aliases.raw = {table}.{end}) "
+                f"WHERE {end}_id IS NULL"
+            ))
+            if conn.dialect.name == "postgresql":
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {end}_id SET NOT NULL"))
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {end}"))
+    conn.execute(text("DROP TABLE place_aliases"))
+
+    # Finish the trip grouping migration 3 deferred, unless trips were already built
+    if not conn.execute(text("SELECT 1 FROM journeys WHERE trip_id IS NOT NULL LIMIT 1")).first():
+        backfill_trips(db)
+        rebuild_daily_stats(db)
+
+def _add_route_rollups(conn):
+    from database import DailyRouteStats
+    from rollups import rebuild_daily_stats
+    from sqlalchemy.orm import Session
+
+    DailyRouteStats.__table__.create(bind=conn, checkfirst=True)
+    rebuild_daily_stats(Session(bind=conn))
+
+def _partition_by_month(conn):
+    from partitions import partition_tables
+
+    # Only with MATRACK_PARTITIONING on Postgres; `python partitions.py convert` does it later.
+    # Copies both tables under an exclusive lock, so plan downtime (see partitions.py)
+    partition_tables(conn)
+
+def _add_period_views(conn):
+    from period_views import create_period_views
+
+    create_period_views(conn)
+
+def _unique_passenger_phones(conn):
+    from passengers import merge_duplicates
+    from sqlalchemy.orm import Session
+
+    # Runs in autocommit, so the merge and the unique index build don't hold one long transaction
+    db = Session(bind=conn)
+    merge_duplicates(db)
+    db.commit()
+    create_index(conn, "ux_passengers_owner_phone", "passengers", ["owner_id", "phone"], unique=True)
+    concurrently = "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+    conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS ix_passengers_owner_phone"))
+
+def _trip_every_journey(conn):
+    from rollups import backfill_trips, rebuild_daily_stats
+    from sqlalchemy.orm import Session
+
+    # Journeys entered on their own used to get no trip; trip counts now come from trips alone
+    if conn.execute(text("SELECT 1 FROM journeys WHERE trip_id IS NULL LIMIT 1")).first():
+        db = Session(bind=conn)
+        backfill_trips(db)
+        rebuild_daily_stats(db)
+
+def _add_route_seats_sold(conn):
+    from rollups import rebuild_daily_stats
+    from sqlalchemy.orm import Session
+
+    columns = _column_names(conn, "daily_route_stats")
+    if "seats_sold" not in columns:
+        conn.execute(text("ALTER TABLE daily_route_stats ADD COLUMN seats_sold INTEGER NOT NULL DEFAULT 0"))
+    if "trip_revenue" not in columns:
+        conn.execute(text("ALTER TABLE daily_route_stats ADD COLUMN trip_revenue FLOAT NOT NULL DEFAULT 0"))
+    rebuild_daily_stats(Session(bind=conn))
+
+MIGRATIONS = [
+    Migration(1, "Add composite report indexes", _add_report_indexes, False),
+    Migration(2, "Add and backfill daily owner rollups", _add_daily_rollups, True),
+    Migration(3, "Add trips and link journeys to them", _add_trips, True),
+    Migration(4, "Replace place names with a places dictionary", _add_places, True),
+    Migration(5, "Add and backfill daily route rollups", _add_route_rollups, True),
+    Migration(6, "Partition journeys and expenses by month", _partition_by_month, True),
+    Migration(7, "Add weekly and monthly period views", _add_period_views, True),
+    Migration(8, "Merge duplicate passengers and make phones unique per owner", _unique_passenger_phones, False),
+    Migration(9, "Give journeys recorded without a trip their own trips", _trip_every_journey, True),
+    Migration(10, "Add trip seats sold and revenue to route rollups", _add_route_seats_sold, True),
+]
+
+def head_version():
+    """Get the latest migration version known to the code"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+def applied_versions():
+    """Get a dict of applied migration versions to their applied_at timestamps"""
+    engine = get_engine()
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        rows = conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at))
+        return {r.version: r.applied_at for r in rows}
+
+def _record(migration):
+    with get_engine().begin() as conn:
+        conn.execute(schema_migrations.insert().values(
+            version=migration.version,
+            description=migration.description,
+            applied_at=datetime.now()
+        ))
+
+def upgrade():
+    """Bring the database schema up to the latest version.
+
+    A fresh database gets all tables from the models and is stamped at the head
+    version. An existing database gets any new tables and then runs every
+    pending migration in order. Either way upcoming monthly partitions are
+    created when partitioning is on. Returns the list of migrations applied.
+    """
+    from partitions import partition_tables, maintain_partitions
+    from period_views import create_period_views
+
+    engine = get_engine()
+    fresh = not inspect(engine).has_table("users")
+    applied = applied_versions()
+    Base.metadata.create_all(bind=engine)
+
+    pending = [m for m in MIGRATIONS if m.version not in applied]
+    if fresh:
+        for migration in pending:
+            _record(migration)
+        # The new tables are empty, so partitioning them is instant
+        with engine.begin() as conn:
+            partition_tables(conn)
+            create_period_views(conn)
+        maintain_partitions()
+        return []
+
+    for migration in pending:
+        if migration.transactional:
+            with engine.begin() as conn:
+                migration.upgrade(conn)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                migration.upgrade(conn)
+        _record(migration)
+    maintain_partitions()
+    return pending
+
+def status():
+    """Get (version, description, applied_at) for every known migration"""
+    applied = applied_versions()
+    return [(m.version, m.description, applied.get(m.version)) for m in MIGRATIONS]
+
+def index_report():
+    """Describe every declared secondary index and the DataManager queries that use it"""
+    inspector = inspect(get_engine())
+    report = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)} \
+            if inspector.has_table(table.name) else set()
+        if "used_by" in table.info:
+            report.append({
+                "index": f"{table.name}_pkey",
+                "table": table.name,
+                "columns": [c.name for c in table.primary_key.columns],
+                "include": [],
+                "exists": table.name in inspector.get_table_names(),
+                "used_by": table.info["used_by"],
+            })
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if "used_by" not in index.info:
+                continue
+            report.append({
+                "index": index.name,
+                "table": table.name,
+                "columns": [c.name for c in index.columns],
+                "include": index.dialect_options["postgresql"]["include"] or [],
+                "exists": index.name in existing,
+                "used_by": index.info["used_by"],
+            })
+    return report
@@ -0,0 +1,292 @@
+"""Optional monthly range partitioning of journeys and expenses on Postgres.
+
+With MATRACK_PARTITIONING enabled, journeys are partitioned on journey_date and
+expenses on date, one partition per calendar month plus a default partition
+that catches rows outside every month created so far. Queries that filter on
+the date (exports, DataManager's journey and expense lists given dates, rollup
+rebuilds) only touch the partitions for the months in range, so their cost
+stays flat as history grows, and old months can be archived by detaching a
+partition. Reports themselves read the daily rollups.
+
+Converting an existing table is downtime: partition_table copies every row in
+one transaction that holds an exclusive lock on the table until it commits, so
+reads and writes of journeys and expenses wait for the whole copy. Run the
+upgrade (migration 6) or `python partitions.py convert` in a maintenance window
+sized to the tables; a fresh database is partitioned while still empty.
+
+Partitions are created ahead of time: this month and the next
+MATRACK_PARTITION_MONTHS_AHEAD months, by the schema upgrade, by
+`python partitions.py maintain` and by a background thread in the app. Rows
+that reached the default partition move into their month when it is created.
+SQLite has no partitioning; every function here is a no-op there.
+
+Usage:
+    python partitions.py maintain [--months-ahead 3]
+    python partitions.py convert
+    python partitions.py list
+    python partitions.py check [--start 2025-01-01] [--end 2025-03-31]
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint, CreateIndex
+from database import get_engine, Base
+
+PARTITIONING_ENABLED = os.getenv('MATRACK_PARTITIONING', 'false').lower() in ('1', 'true', 'yes')
+PARTITION_MONTHS_AHEAD = int(os.getenv('MATRACK_PARTITION_MONTHS_AHEAD', '3'))
+# How often the app's background thread checks for upcoming months
+PARTITION_CHECK_SECONDS = float(os.getenv('MATRACK_PARTITION_CHECK_SECONDS', str(6 * 3600)))
+
+# Partitioned table -> the date column it is partitioned on
+PARTITIONED_TABLES = {
+    'journeys': 'journey_date',
+    'expenses': 'date',
+}
+
+# Serializes partition DDL between app processes and the CLI
+_ADVISORY_LOCK_KEY = 7061201
+
+def _first_of_month(day):
+    return day.replace(day=1)
+
+def _add_months(month, months):
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+def _months(first, last):
+    month = _first_of_month(first)
+    while month <= last:
+        yield month
+        month = _add_months(month, 1)
+
+def partition_name(table, month):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def partitioning_active(bind):
+    """Whether partitioning is enabled and the engine or connection is on Postgres"""
+    return PARTITIONING_ENABLED and bind.dialect.name == 'postgresql'
+
+def _exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is not None
+
+def is_partitioned(conn, table):
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table"
+    ), {'table': table}).first() is not None
+
+def partitions_of(conn, table):
+    """Get (name, estimated rows) for every partition of table, in name order"""
+    return conn.execute(text(
+        "SELECT c.relname, greatest(c.reltuples, 0)::bigint FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {'table': table}).all()
+
+def ensure_partitions(conn, table, first_month, last_month):
+    """Create the default partition and the monthly partitions from first_month to last_month.
+
+    Returns the names of the partitions created.
+    """
+    key = PARTITIONED_TABLES[table]
+    default = f"{table}_default"
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT"))
+
+    created = []
+    for month in _months(first_month, last_month):
+        name = partition_name(table, month)
+        if _exists(conn, name):
+            continue
+        bounds = {'start': month, 'end': _add_months(month, 1)}
+        bounds_sql = f"FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+        in_month = f'"{key}" >= :start AND "{key}" < :end'
+        stray = conn.execute(text(f"SELECT 1 FROM {default} WHERE {in_month} LIMIT 1"), bounds).first()
+        if stray:
+            # Postgres refuses a new partition while the default holds rows for its
+            # range, so the rows move into a standalone table that is then attached
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+            conn.execute(text(
+                f"WITH moved AS (DELETE FROM {default} WHERE {in_month} RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds_sql}"))
+        else:
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds_sql}"))
+        created.append(name)
+    return created
+
+def partition_table(conn, table, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Turn a plain table into a monthly partitioned one, copying its rows.
+
+    The primary key becomes (id, date column) because Postgres requires the
+    partition key in every unique constraint; ids still come from the table's
+    original sequence. The rename locks the table until the caller commits, so
+    it is unavailable for the whole copy. Returns False if the table is
+    already partitioned.
+    """
+    if is_partitioned(conn, table):
+        return False
+
+    model_table = Base.metadata.tables[table]
+    key = PARTITIONED_TABLES[table]
+    old = f"{table}_unpartitioned"
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table}).scalar()
+
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    conn.execute(text(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ("{key}")'))
+
+    first, last = conn.execute(text(f'SELECT min("{key}"), max("{key}") FROM {old}')).one()
+    this_month = _first_of_month(date.today())
+    ensure_partitions(conn, table, min(first or this_month, this_month),
+                      max(last or this_month, _add_months(this_month, months_ahead)))
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+    if sequence:
+        # Keep the sequence (and so the id default) when the old table is dropped
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+    # Declared on the parent after the copy; Postgres builds them on every partition
+    conn.execute(text(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "{key}")'))
+    for constraint in model_table.foreign_key_constraints:
+        conn.execute(AddConstraint(constraint))
+    for index in model_table.indexes:
+        conn.execute(CreateIndex(index))
+    return True
+
+def partition_tables(conn):
+    """Partition every table in PARTITIONED_TABLES when partitioning is active; returns those converted"""
+    if not partitioning_active(conn):
+        return []
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _ADVISORY_LOCK_KEY})
+    return [table for table in PARTITIONED_TABLES if partition_table(conn, table)]
+
+def maintain_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create this month's and the next months_ahead months' partitions; returns the names created"""
+    engine = get_engine()
+    if not partitioning_active(engine):
+        return []
+    this_month = _first_of_month(date.today())
+    created = []
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _ADVISORY_LOCK_KEY})
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(conn, table):
+                created += ensure_partitions(conn, table, this_month, _add_months(this_month, months_ahead))
+    return created
+
+_maintenance_thread = None
+_maintenance_lock = threading.Lock()
+
+def _maintenance_loop(interval):
+    while True:
+        try:
+            maintain_partitions()
+        except Exception:
+            # Rows keep landing in the default partition until the next attempt succeeds
+            pass
+        time.sleep(interval)
+
+def start_maintenance(interval=PARTITION_CHECK_SECONDS):
+    """Start the background thread that keeps upcoming partitions created, once per process"""
+    global _maintenance_thread
+    if not PARTITIONING_ENABLED:
+        return
+    with _maintenance_lock:
+        if _maintenance_thread is None:
+            _maintenance_thread = threading.Thread(
+                target=_maintenance_loop, args=(interval,), name='partition-maintenance', daemon=True)
+            _maintenance_thread.start()
+
+def _scanned_relations(plan):
+    """Names of every relation scanned anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    names = set()
+    stack = [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node:
+            names.add(node['Relation Name'])
+        stack.extend(node.get('Plans', []))
+    return names
+
+def _pruning_queries(start_date, end_date):
+    from exporter import _journey_query, _expense_query
+    from data_manager import journeys_query, expenses_query
+
+    # The owner doesn't affect pruning; any id gives the same plan shape
+    owner_id = 1
+    return [
+        ('journeys export', 'journeys', _journey_query(None, start_date, end_date)),
+        ('expenses export', 'expenses', _expense_query(None, start_date, end_date)),
+        ('journeys report', 'journeys', journeys_query(owner_id, start_date, end_date)),
+        ('expenses report', 'expenses', expenses_query(owner_id, start_date, end_date)),
+    ]
+
+def check_pruning(start_date, end_date):
+    """EXPLAIN date-range queries and report the partitions each one scans.
+
+    Returns (label, scanned partitions, partitions outside the range) per
+    query; a query prunes correctly when the last list is empty.
+    """
+    results = []
+    with get_engine().connect() as conn:
+        for label, table, query in _pruning_queries(start_date, end_date):
+            existing = {name for name, _ in partitions_of(conn, table)}
+            in_range = {partition_name(table, m) for m in _months(start_date, end_date)}
+            needed = in_range & existing
+            if in_range - existing:
+                needed.add(f"{table}_default")
+
+            compiled = query.compile(dialect=conn.dialect)
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+            scanned = sorted(_scanned_relations(plan) & existing)
+            results.append((label, scanned, sorted(set(scanned) - needed)))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of journeys and expenses")
+    parser.add_argument(
+        "command",
+        choices=["maintain", "convert", "list", "check"],
+        help="maintain: create upcoming partitions; convert: partition existing tables; "
+             "list: show partitions; check: verify date-range queries only scan their months"
+    )
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD,
+                        help="Months after the current one to create partitions for")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day for check (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day for check (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if not partitioning_active(engine):
+        parser.exit(1, "Partitioning needs a Postgres DATABASE_URL and MATRACK_PARTITIONING=true\n")
+
+    if args.command == "maintain":
+        created = maintain_partitions(args.months_ahead)
+        print(f"Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+    elif args.command == "convert":
+        with engine.begin() as conn:
+            converted = partition_tables(conn)
+        print(f"Partitioned {', '.join(converted)}" if converted else "Tables are already partitioned")
+    elif args.command == "list":
+        with engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                for name, rows in partitions_of(conn, table):
+                    print(f"{name:<28} {rows:>12,} rows")
+    else:
+        end = args.end or date.today()
+        start = args.start or _first_of_month(end)
+        failed = False
+        for label, scanned, outside in check_pruning(start, end):
+            state = f"scans {len(outside)} partitions outside the range" if outside else "ok"
+            print(f"{label:<18} {len(scanned):>3} partitions scanned  {state}")
+            for name in outside:
+                print(f"    {name}")
+            failed = failed or bool(outside)
+        if failed:
+            parser.exit(1)
+
+if __name__ == "__main__":
+    main()
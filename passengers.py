@@ -0,0 +1,199 @@
+"""Passenger lookup by phone number, one passenger per owner and phone.
+
+Phones are stored normalized (separators such as spaces, dashes, dots and
+brackets removed), and a unique index on (owner_id, phone) stops concurrent
+sessions from creating the same passenger twice. passenger_ids resolves a
+batch of riders with a single INSERT ... ON CONFLICT ... RETURNING statement,
+and committed ids are kept in a per-owner LRU cache so repeat riders need no
+query at all. Ids only enter the cache once the transaction that resolved
+them commits, so a rolled-back insert never leaves a dangling id behind.
+
+The dedup command normalizes existing phones and merges passengers that
+share an owner and phone into the oldest one, moving their journeys. Stop
+the app while it runs.
+
+Usage:
+    python passengers.py dedup [--dry-run]
+"""
+import argparse
+import os
+import re
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, update, delete, func, event, bindparam
+from sqlalchemy.orm import Session
+from database import session_scope, Passenger, Journey
+from sql_compat import upsert_insert
+
+PASSENGER_CACHE_SIZE = int(os.getenv('PASSENGER_CACHE_SIZE', '5000'))
+PASSENGER_CACHE_OWNERS = int(os.getenv('PASSENGER_CACHE_OWNERS', '1000'))
+
+# Characters people type between the digits of a phone number
+PHONE_SEPARATORS = ' -.()'
+_SEPARATORS = re.compile(f"[{re.escape(PHONE_SEPARATORS)}]")
+
+def normalize_phone(phone):
+    """Remove separators from a phone number, keeping a leading +"""
+    return _SEPARATORS.sub('', phone or '')
+
+def normalized_phone_sql(column):
+    """SQL expression that normalizes a phone column the same way as normalize_phone"""
+    for separator in PHONE_SEPARATORS:
+        column = func.replace(column, separator, '')
+    return column
+
+class PassengerCache:
+    """Thread-safe per-owner LRU maps of phone -> passenger id"""
+
+    def __init__(self, max_per_owner=PASSENGER_CACHE_SIZE, max_owners=PASSENGER_CACHE_OWNERS):
+        self.max_per_owner = max_per_owner
+        self.max_owners = max_owners
+        self._owners = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, owner_id, phones):
+        with self._lock:
+            ids = self._owners.get(owner_id)
+            found = {}
+            if ids is not None:
+                self._owners.move_to_end(owner_id)
+                for phone in phones:
+                    if phone in ids:
+                        ids.move_to_end(phone)
+                        found[phone] = ids[phone]
+            self.hits += len(found)
+            self.misses += len(phones) - len(found)
+            return found
+
+    def update(self, owner_id, ids_by_phone):
+        with self._lock:
+            ids = self._owners.get(owner_id)
+            if ids is None:
+                ids = self._owners[owner_id] = OrderedDict()
+            self._owners.move_to_end(owner_id)
+            for phone, passenger_id in ids_by_phone.items():
+                ids[phone] = passenger_id
+                ids.move_to_end(phone)
+            while len(ids) > self.max_per_owner:
+                ids.popitem(last=False)
+            while len(self._owners) > self.max_owners:
+                self._owners.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._owners.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'owners': len(self._owners),
+                'entries': sum(len(ids) for ids in self._owners.values())
+            }
+
+# Process-wide cache shared by every DataManager, the importer and the write-behind worker
+passenger_cache = PassengerCache()
+
+# Ids resolved in a session wait in session.info until its transaction commits.
+# Each batch is tagged with the transaction (or savepoint) that resolved it.
+_PENDING = 'pending_passenger_ids'
+
+@event.listens_for(Session, 'after_commit')
+def _cache_committed_ids(session):
+    if session.in_nested_transaction():
+        # Releasing a savepoint; the outer transaction can still roll back
+        return
+    for _, owner_id, ids_by_phone in session.info.pop(_PENDING, []):
+        passenger_cache.update(owner_id, ids_by_phone)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back_ids(session, previous_transaction):
+    pending = session.info.get(_PENDING)
+    if not pending:
+        return
+    if previous_transaction.nested:
+        session.info[_PENDING] = [p for p in pending if p[0] is not previous_transaction]
+    else:
+        session.info.pop(_PENDING, None)
+
+def passenger_ids(db, owner_id, passengers):
+    """Get a phone -> passenger id map for dicts with name and phone, creating missing passengers.
+
+    Keys are the phones as given; a phone that appears more than once keeps
+    the first name given for it.
+    """
+    normalized = {p['phone']: normalize_phone(p['phone']) for p in passengers}
+    names_by_phone = {}
+    for p in passengers:
+        names_by_phone.setdefault(normalized[p['phone']], p['name'])
+
+    ids_by_phone = passenger_cache.get_many(owner_id, list(names_by_phone))
+    missing = [phone for phone in names_by_phone if phone not in ids_by_phone]
+    if missing:
+        stmt = upsert_insert(db, Passenger).values([
+            {'owner_id': owner_id, 'phone': phone, 'name': names_by_phone[phone]} for phone in missing
+        ])
+        # A no-op update, so existing passengers are returned alongside new ones
+        resolved = dict(db.execute(stmt.on_conflict_do_update(
+            index_elements=['owner_id', 'phone'],
+            set_={'name': Passenger.name}
+        ).returning(Passenger.phone, Passenger.id)).all())
+        ids_by_phone.update(resolved)
+        transaction = db.get_nested_transaction() or db.get_transaction()
+        db.info.setdefault(_PENDING, []).append((transaction, owner_id, resolved))
+
+    return {phone: ids_by_phone[phone_key] for phone, phone_key in normalized.items()}
+
+def merge_duplicates(db, dry_run=False):
+    """Normalize stored phones and merge passengers sharing an owner and phone into the oldest.
+
+    Returns (phones normalized, passengers merged away).
+    """
+    normalized_phone = normalized_phone_sql(Passenger.phone)
+    normalized = db.execute(select(func.count()).where(Passenger.phone != normalized_phone)).scalar()
+    if not dry_run:
+        db.execute(update(Passenger).where(Passenger.phone != normalized_phone).values(phone=normalized_phone))
+        phone = Passenger.phone
+    else:
+        phone = normalized_phone
+
+    keepers = select(
+        Passenger.owner_id, phone.label('phone'), func.min(Passenger.id).label('keeper_id')
+    ).group_by(Passenger.owner_id, phone).having(func.count() > 1).subquery()
+    merges = db.execute(select(Passenger.id, keepers.c.keeper_id).join(keepers, (
+        (Passenger.owner_id == keepers.c.owner_id) & (phone == keepers.c.phone)
+    )).where(Passenger.id != keepers.c.keeper_id)).all()
+    if dry_run or not merges:
+        return normalized, len(merges)
+
+    journeys = Journey.__table__
+    db.execute(
+        update(journeys).where(journeys.c.passenger_id == bindparam('duplicate_id')).values(
+            passenger_id=bindparam('keeper_id')),
+        [{'duplicate_id': duplicate_id, 'keeper_id': keeper_id} for duplicate_id, keeper_id in merges]
+    )
+    db.execute(delete(Passenger).where(Passenger.id.in_([duplicate_id for duplicate_id, _ in merges])))
+    passenger_cache.clear()
+    return normalized, len(merges)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge passengers that share an owner and phone number")
+    parser.add_argument("command", choices=["dedup"])
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    with session_scope() as db:
+        normalized, merged = merge_duplicates(db, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"Would normalize {normalized} phone numbers and merge {merged} duplicate passengers")
+    else:
+        print(f"Normalized {normalized} phone numbers and merged {merged} duplicate passengers")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Password hashing off the Streamlit script thread, and login throttling.
+
+bcrypt runs on a small bounded thread pool (bcrypt releases the GIL while
+hashing), so a burst of logins can use at most BCRYPT_WORKERS cores and
+excess requests fail fast instead of queueing without limit. BCRYPT_ROUNDS
+sets the cost of new hashes; existing hashes with a different cost are
+reported by needs_rehash so they can be upgraded on the next login.
+
+LoginThrottle limits failed attempts per email within a sliding window so
+credential-stuffing bursts are rejected before any hashing is done.
+"""
+import os
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Hash requests allowed to wait for a worker before new ones are turned away
+BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', str(BCRYPT_WORKERS * 8)))
+BCRYPT_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', '10'))
+
+LOGIN_MAX_ATTEMPTS = int(os.getenv('LOGIN_MAX_ATTEMPTS', '5'))
+LOGIN_WINDOW_SECONDS = float(os.getenv('LOGIN_WINDOW_SECONDS', '300'))
+# Emails tracked at most; the least recently attempted are forgotten first
+LOGIN_TRACKED_EMAILS = 10000
+
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_MAX_PENDING)
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated"""
+
+def _run(func, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy("Too many login requests, please try again shortly")
+    try:
+        future = _executor.submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    # The slot is held until the task finishes or is cancelled, not just while we wait,
+    # so timed-out requests still count against BCRYPT_MAX_PENDING
+    future.add_done_callback(lambda f: _slots.release())
+    try:
+        return future.result(timeout=BCRYPT_TIMEOUT)
+    except FuturesTimeoutError:
+        # Drop the task if no worker has started it; a running hash finishes on its own
+        future.cancel()
+        raise HashingBusy("Login is taking too long, please try again shortly") from None
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+def hash_password(password, rounds=None):
+    """Hash a password on the worker pool at the configured cost"""
+    return _run(_hash, password, rounds or BCRYPT_ROUNDS)
+
+def verify_password(password, hashed):
+    """Check a password against a bcrypt hash on the worker pool"""
+    return _run(_check, password, hashed)
+
+def hash_rounds(hashed):
+    """Get the cost factor of a bcrypt hash such as $2b$12$..."""
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed):
+    return hash_rounds(hashed) != BCRYPT_ROUNDS
+
+class LoginThrottle:
+    """Thread-safe sliding-window count of login attempts per email.
+
+    Each attempt is reserved before the password is checked, so concurrent
+    guesses can't all slip past the limit, and stays counted as a failure
+    unless the login succeeds (reset) or fails for another reason (release).
+    """
+
+    def __init__(self, max_attempts=LOGIN_MAX_ATTEMPTS, window=LOGIN_WINDOW_SECONDS,
+                 max_tracked=LOGIN_TRACKED_EMAILS):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_tracked = max_tracked
+        # Least recently attempted email first, so the oldest are evicted over max_tracked
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def reserve(self, email):
+        """Count an attempt for the email if it is allowed one.
+
+        Returns (retry_after, attempt): retry_after is the seconds until the
+        email may try again, or 0 when the attempt was counted; pass attempt to
+        release() if the password could not be checked.
+        """
+        now = time.monotonic()
+        with self._lock:
+            key = email.strip().lower()
+            failures = self._recent(key, now)
+            if failures is not None and len(failures) >= self.max_attempts:
+                return max(1, int(failures[0] + self.window - now)), None
+            if failures is None:
+                failures = self._failures[key] = deque()
+                while len(self._failures) > self.max_tracked:
+                    self._failures.popitem(last=False)
+            self._failures.move_to_end(key)
+            failures.append(now)
+            return 0, now
+
+    def release(self, email, attempt):
+        """Stop counting an attempt that failed before the password was checked"""
+        with self._lock:
+            failures = self._failures.get(email.strip().lower())
+            if failures is not None and attempt in failures:
+                failures.remove(attempt)
+
+    def reset(self, email):
+        with self._lock:
+            self._failures.pop(email.strip().lower(), None)
+
+# Process-wide throttle shared by every session
+login_throttle = LoginThrottle()
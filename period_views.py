@@ -0,0 +1,338 @@
+"""Weekly and monthly per-owner totals precomputed from the daily rollups.
+
+period_owner_stats holds revenue, passenger, trip and expense totals per owner
+per week and per month; period_owner_expenses holds expense totals by type.
+On Postgres they are materialized views refreshed with REFRESH MATERIALIZED
+VIEW CONCURRENTLY, so reports keep reading the previous contents while a
+refresh runs. SQLite has no materialized views, so there they are plain
+tables recomputed in one transaction (WAL readers are not blocked).
+
+The views are refreshed by a background thread in the app every
+MATRACK_PERIOD_REFRESH_SECONDS, and soon after a bulk import. Between
+refreshes reports only read whole periods that had closed at the last refresh
+and have not been changed since: writes to an already closed period record
+the earliest day they touched in period_view_stale, and everything else
+(partial periods at the edges of a range, the current period, periods changed
+since the refresh) is read from the daily rollups. Results are always the
+same as reading the daily rollups alone.
+
+Usage:
+    python period_views.py
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import (
+    Table, Column, Integer, String, Float, Date, MetaData, PrimaryKeyConstraint, select, delete,
+    insert, func, literal, union_all, or_, case, text
+)
+from sqlalchemy.orm import Session
+from database import get_engine, DailyOwnerStats, DailyOwnerExpense, PeriodViewRefresh, PeriodViewStale
+from sql_compat import period_bucket, upsert_insert
+
+PERIOD_TYPES = ('Weekly', 'Monthly')
+# Seconds between background refreshes; 0 turns the scheduler off
+PERIOD_REFRESH_SECONDS = float(os.getenv('MATRACK_PERIOD_REFRESH_SECONDS', '300'))
+# Wait after a bulk import before refreshing, so consecutive imports share one refresh
+PERIOD_REFRESH_DELAY = float(os.getenv('MATRACK_PERIOD_REFRESH_DELAY', '5'))
+
+REFRESH_NAME = 'period_views'
+
+view_metadata = MetaData()
+
+period_owner_stats = Table(
+    "period_owner_stats",
+    view_metadata,
+    Column("owner_id", Integer, nullable=False),
+    Column("period_type", String, nullable=False),
+    Column("period_start", Date, nullable=False),
+    Column("revenue", Float, nullable=False),
+    Column("passenger_count", Integer, nullable=False),
+    Column("trip_count", Integer, nullable=False),
+    Column("expenses", Float, nullable=False),
+    PrimaryKeyConstraint("owner_id", "period_type", "period_start"),
+)
+
+period_owner_expenses = Table(
+    "period_owner_expenses",
+    view_metadata,
+    Column("owner_id", Integer, nullable=False),
+    Column("period_type", String, nullable=False),
+    Column("period_start", Date, nullable=False),
+    Column("expense_type", String, nullable=False),
+    Column("amount", Float, nullable=False),
+    PrimaryKeyConstraint("owner_id", "period_type", "period_start", "expense_type"),
+)
+
+def _stats_definition():
+    parts = []
+    for period_type in PERIOD_TYPES:
+        period = period_bucket(period_type)(DailyOwnerStats.day)
+        parts.append(select(
+            DailyOwnerStats.owner_id,
+            literal(period_type).label('period_type'),
+            period.label('period_start'),
+            func.sum(DailyOwnerStats.revenue).label('revenue'),
+            func.sum(DailyOwnerStats.passenger_count).label('passenger_count'),
+            func.sum(DailyOwnerStats.trip_count).label('trip_count'),
+            func.sum(DailyOwnerStats.expenses).label('expenses')
+        ).group_by(DailyOwnerStats.owner_id, period))
+    return union_all(*parts)
+
+def _expenses_definition():
+    parts = []
+    for period_type in PERIOD_TYPES:
+        period = period_bucket(period_type)(DailyOwnerExpense.day)
+        parts.append(select(
+            DailyOwnerExpense.owner_id,
+            literal(period_type).label('period_type'),
+            period.label('period_start'),
+            DailyOwnerExpense.expense_type,
+            func.sum(DailyOwnerExpense.amount).label('amount')
+        ).group_by(DailyOwnerExpense.owner_id, period, DailyOwnerExpense.expense_type))
+    return union_all(*parts)
+
+# View -> its defining query
+VIEWS = [
+    (period_owner_stats, _stats_definition),
+    (period_owner_expenses, _expenses_definition),
+]
+
+def _record_refresh(conn, refreshed_on):
+    stmt = upsert_insert(Session(bind=conn), PeriodViewRefresh).values(
+        name=REFRESH_NAME, refreshed_on=refreshed_on, refreshed_at=datetime.now())
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'refreshed_on': stmt.excluded.refreshed_on, 'refreshed_at': stmt.excluded.refreshed_at}
+    ))
+
+def create_period_views(conn):
+    """Create and populate the period views if they do not exist"""
+    refreshed_on = date.today()
+    conn.execute(delete(PeriodViewStale))
+    if conn.dialect.name != 'postgresql':
+        view_metadata.create_all(bind=conn)
+        _refresh(conn)
+    else:
+        for view, definition in VIEWS:
+            query = definition().compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+            conn.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view.name} AS {query}"))
+            # REFRESH ... CONCURRENTLY needs a unique index covering every row
+            key = ", ".join(c.name for c in view.primary_key.columns)
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{view.name} ON {view.name} ({key})"))
+    _record_refresh(conn, refreshed_on)
+
+def drop_period_views(conn):
+    """Drop the period views, which must go before the rollup tables they are built from"""
+    if conn.dialect.name != 'postgresql':
+        view_metadata.drop_all(bind=conn)
+        return
+    for view, _ in VIEWS:
+        conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {view.name}"))
+
+def _refresh(conn):
+    if conn.dialect.name == 'postgresql':
+        for view, _ in VIEWS:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}"))
+        return
+    for view, definition in VIEWS:
+        conn.execute(delete(view))
+        conn.execute(insert(view).from_select([c.name for c in view.columns], definition()))
+
+def refresh_period_views():
+    """Recompute the period views from the daily rollups; returns the seconds taken"""
+    started = time.perf_counter()
+    refreshed_on = date.today()
+    with get_engine().begin() as conn:
+        # Marks are cleared before the refresh reads the rollups, so a write that
+        # lands during the refresh leaves its mark behind for the next one
+        conn.execute(delete(PeriodViewStale))
+        _refresh(conn)
+        _record_refresh(conn, refreshed_on)
+    return time.perf_counter() - started
+
+def period_start(period_type, day):
+    if period_type == 'Weekly':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def next_period_start(period_type, day):
+    start = period_start(period_type, day)
+    if period_type == 'Weekly':
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def mark_stale(db, owner_id, first_day, today=None):
+    """Record a write on first_day so the views stop serving its periods until the next refresh.
+
+    Writes to a week and month that are both still open need no mark: open
+    periods are never read from the views.
+    """
+    today = today or date.today()
+    if first_day >= max(period_start(p, today) for p in PERIOD_TYPES):
+        return
+    stmt = upsert_insert(db, PeriodViewStale).values(owner_id=owner_id, stale_from=first_day)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['owner_id'],
+        set_={'stale_from': case(
+            (stmt.excluded.stale_from < PeriodViewStale.stale_from, stmt.excluded.stale_from),
+            else_=PeriodViewStale.stale_from
+        )}
+    ))
+
+def view_range(db, owner_id, period_type, start_date, end_date):
+    """Get (first day, day after last) of the whole periods between the dates the views can serve.
+
+    Returns None when no whole period in the range is both closed at the last
+    refresh and unchanged since.
+    """
+    refreshed_on, stale_from = db.execute(select(
+        select(PeriodViewRefresh.refreshed_on).where(PeriodViewRefresh.name == REFRESH_NAME).scalar_subquery(),
+        select(PeriodViewStale.stale_from).where(PeriodViewStale.owner_id == owner_id).scalar_subquery()
+    )).one()
+    if refreshed_on is None:
+        return None
+
+    first = start_date if period_start(period_type, start_date) == start_date \
+        else next_period_start(period_type, start_date)
+    limit = min(end_date + timedelta(days=1), refreshed_on, stale_from or refreshed_on)
+    last = period_start(period_type, limit)
+    return (first, last) if first < last else None
+
+def _outside(day_column, covered):
+    first, last = covered
+    return or_(day_column < first, day_column >= last)
+
+def period_stats_rows(db, owner_id, period_type, start_date, end_date):
+    """Subquery of (period, revenue, passenger_count, trip_count, expenses) rows covering the dates.
+
+    Whole periods the views can serve come from period_owner_stats and the
+    remaining days from daily_owner_stats; group by period to get totals.
+    """
+    period = period_bucket(period_type)(DailyOwnerStats.day)
+    daily_filters = [
+        DailyOwnerStats.owner_id == owner_id,
+        DailyOwnerStats.day.between(start_date, end_date)
+    ]
+    covered = view_range(db, owner_id, period_type, start_date, end_date)
+    if covered:
+        daily_filters.append(_outside(DailyOwnerStats.day, covered))
+
+    daily = select(
+        period.label('period'),
+        DailyOwnerStats.revenue,
+        DailyOwnerStats.passenger_count,
+        DailyOwnerStats.trip_count,
+        DailyOwnerStats.expenses
+    ).where(*daily_filters)
+    if not covered:
+        return daily.subquery()
+
+    view = period_owner_stats.c
+    return union_all(daily, select(
+        view.period_start.label('period'),
+        view.revenue,
+        view.passenger_count,
+        view.trip_count,
+        view.expenses
+    ).where(
+        view.owner_id == owner_id,
+        view.period_type == period_type,
+        view.period_start >= covered[0],
+        view.period_start < covered[1]
+    )).subquery()
+
+def expense_rows(db, owner_id, start_date, end_date):
+    """Subquery of (expense_type, amount) rows covering the dates, whole months from the view"""
+    daily_filters = [
+        DailyOwnerExpense.owner_id == owner_id,
+        DailyOwnerExpense.day.between(start_date, end_date)
+    ]
+    covered = view_range(db, owner_id, 'Monthly', start_date, end_date)
+    if covered:
+        daily_filters.append(_outside(DailyOwnerExpense.day, covered))
+
+    daily = select(DailyOwnerExpense.expense_type, DailyOwnerExpense.amount).where(*daily_filters)
+    if not covered:
+        return daily.subquery()
+
+    view = period_owner_expenses.c
+    return union_all(daily, select(view.expense_type, view.amount).where(
+        view.owner_id == owner_id,
+        view.period_type == 'Monthly',
+        view.period_start >= covered[0],
+        view.period_start < covered[1]
+    )).subquery()
+
+class PeriodViewRefresher:
+    """Background thread that refreshes the period views on an interval and on request"""
+
+    def __init__(self, interval=PERIOD_REFRESH_SECONDS, delay=PERIOD_REFRESH_DELAY):
+        self.interval = interval
+        self.delay = delay
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_at = None
+        self.last_duration_ms = None
+        self.last_error = None
+
+    def start(self):
+        """Start the thread once per process; does nothing when the interval is 0"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='period-view-refresh', daemon=True)
+                self._thread.start()
+
+    def request_refresh(self):
+        """Ask for a refresh soon, e.g. after a bulk import; returns immediately"""
+        self._wake.set()
+
+    def refresh(self):
+        try:
+            seconds = refresh_period_views()
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+            return
+        with self._lock:
+            self.refreshes += 1
+            self.last_refresh_at = datetime.now()
+            self.last_duration_ms = round(seconds * 1000, 1)
+            self.last_error = None
+
+    def _run(self):
+        while True:
+            if self._wake.wait(self.interval):
+                # Let the rest of a burst of imports land before refreshing
+                time.sleep(self.delay)
+            self._wake.clear()
+            self.refresh()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'interval_seconds': self.interval,
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'last_refresh_at': self.last_refresh_at.isoformat(timespec='seconds') if self.last_refresh_at else None,
+                'last_duration_ms': self.last_duration_ms,
+                'last_error': self.last_error
+            }
+
+# Process-wide refresher started by the app
+period_refresher = PeriodViewRefresher()
+
+def main():
+    seconds = refresh_period_views()
+    print(f"Period views refreshed in {seconds * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Dictionary of place names that journeys and trips reference by id.
+
+Names are matched on a normalized key (whitespace collapsed, case folded), so
+"Nairobi", " nairobi " and "NAIROBI" are one place. Ids of committed places
+never change, so they are kept in a process-wide name -> id cache and most
+inserts resolve their origin and destination without a query.
+"""
+import threading
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from database import Place
+from sql_compat import upsert_insert
+
+# Journeys and trips join places twice, once per end of the route
+OriginPlace = aliased(Place, name="origin_place")
+DestinationPlace = aliased(Place, name="destination_place")
+
+def normalize_place(name):
+    """Get (key, display name) for a place name; all-lower or all-upper names are title-cased"""
+    display = " ".join((name or "").split())
+    if not display:
+        raise ValueError("Place name is required")
+    if display.islower() or display.isupper():
+        display = display.title()
+    return display.casefold(), display
+
+class PlaceCache:
+    """Thread-safe map of normalized place keys to ids"""
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self._lock:
+            return {k: self._ids[k] for k in keys if k in self._ids}
+
+    def update(self, ids_by_key):
+        with self._lock:
+            self._ids.update(ids_by_key)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+# Process-wide cache shared by every DataManager and the importer
+place_cache = PlaceCache()
+
+def place_ids(db, names):
+    """Get a name -> place id map for the given names, creating missing places"""
+    normalized = {name: normalize_place(name) for name in set(names)}
+    keys = {key: display for key, display in normalized.values()}
+
+    ids_by_key = place_cache.get_many(keys)
+    missing = [key for key in keys if key not in ids_by_key]
+    if missing:
+        # Only rows that existed before this call are cached: places created here
+        # are not committed yet and would be wrong if the transaction rolls back
+        found = dict(db.execute(select(Place.key, Place.id).where(Place.key.in_(missing))).all())
+        place_cache.update(found)
+        ids_by_key.update(found)
+
+        new = [key for key in missing if key not in found]
+        if new:
+            db.execute(upsert_insert(db, Place).values([
+                {'key': key, 'name': keys[key]} for key in new
+            ]).on_conflict_do_nothing(index_elements=['key']))
+            ids_by_key.update(db.execute(select(Place.key, Place.id).where(Place.key.in_(new))).all())
+
+    return {name: ids_by_key[key] for name, (key, _) in normalized.items()}
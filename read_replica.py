@@ -0,0 +1,240 @@
+"""Optional read replica for report and feed queries.
+
+With REPLICA_DATABASE_URL set, DataManager's get_* reads (and so
+calculate_financial_metrics) run on the replica while every write stays on
+the primary. A background thread in the app writes a heartbeat timestamp to
+the primary every REPLICA_HEARTBEAT_SECONDS; the heartbeat the replica has
+replayed tells how far behind it is. A read goes to the primary instead when:
+
+- the replica is more than REPLICA_MAX_LAG_SECONDS behind, has no heartbeat
+  yet, or could not be reached, or
+- the owner committed a write in this process that the replica has not
+  replayed yet (read-your-writes). The fallback ends as soon as the replica
+  shows a heartbeat written after that commit.
+
+Heartbeat times come from the clocks of the app processes, so keep them in
+sync. Read-your-writes covers writes made by the same process.
+
+Two SQLite files can stand in for a primary and a streaming replica when
+testing locally: point DATABASE_URL and REPLICA_DATABASE_URL at them and run
+`python read_replica.py sync --every 5` to copy the primary onto the replica
+every five seconds.
+
+Usage:
+    python read_replica.py status
+    python read_replica.py sync [--every SECONDS]
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, InterfaceError
+from sqlalchemy.orm import sessionmaker
+import instrumentation
+from database import DATABASE_URL, build_engine, session_scope, ReplicaHeartbeat
+from sql_compat import upsert_insert
+
+REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL', '')
+# How far behind the primary the replica may be and still serve reads
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '10'))
+REPLICA_HEARTBEAT_SECONDS = float(os.getenv('REPLICA_HEARTBEAT_SECONDS', '1'))
+# How long a reading of the replica's heartbeat is reused before it is read again
+REPLICA_CHECK_SECONDS = float(os.getenv('REPLICA_CHECK_SECONDS', '1'))
+
+HEARTBEAT_NAME = 'primary'
+# Reasons a read is sent to the primary
+FALLBACK_REASONS = ('unavailable', 'stale', 'read_your_writes')
+
+class ReplicaRouter:
+    """Chooses the replica or the primary for each read and keeps the heartbeat going"""
+
+    def __init__(self, url=REPLICA_DATABASE_URL, max_lag=REPLICA_MAX_LAG_SECONDS,
+                 heartbeat_interval=REPLICA_HEARTBEAT_SECONDS, check_interval=REPLICA_CHECK_SECONDS):
+        self.url = url
+        self.max_lag = max_lag
+        self.heartbeat_interval = heartbeat_interval
+        self.check_interval = check_interval
+        self._engine = None
+        self._sessions = sessionmaker(autocommit=False, autoflush=False)
+        self._lock = threading.Lock()
+        self._thread = None
+        # Owner -> time of the owner's last commit the replica has not shown yet
+        self._last_write = {}
+        self._position = None
+        self._available = False
+        self._checked_at = None
+        self.replica_reads = 0
+        self.primary_reads = dict.fromkeys(FALLBACK_REASONS, 0)
+        self.last_error = None
+
+    @property
+    def enabled(self):
+        return bool(self.url)
+
+    def _get_engine(self):
+        with self._lock:
+            if self._engine is None:
+                self._engine = build_engine(self.url)
+                instrumentation.install(self._engine)
+                self._sessions.configure(bind=self._engine)
+            return self._engine
+
+    def start(self):
+        """Start the heartbeat thread once per process, when a replica is configured"""
+        with self._lock:
+            if self.enabled and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='replica-heartbeat', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.beat()
+            except Exception as e:
+                with self._lock:
+                    self.last_error = f"Heartbeat failed: {str(e)}"
+            time.sleep(self.heartbeat_interval)
+
+    def beat(self):
+        """Write the current time to the primary's heartbeat row"""
+        with session_scope() as db:
+            stmt = upsert_insert(db, ReplicaHeartbeat).values(name=HEARTBEAT_NAME, beat_at=datetime.now())
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=['name'], set_={'beat_at': stmt.excluded.beat_at}
+            ))
+
+    def record_write(self, owner_id):
+        """Send the owner's reads to the primary until the replica has replayed a write just committed.
+
+        Call it before invalidating the owner's cached reports, so a report
+        recomputed in between can't read the replica and be cached as current.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._last_write[owner_id] = datetime.now()
+
+    def mark_unavailable(self, error):
+        """Send reads to the primary until the replica is checked again"""
+        with self._lock:
+            self._available = False
+            self._checked_at = time.monotonic()
+            self.last_error = str(error)
+
+    def _check(self):
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._available, self._position
+        try:
+            with self._get_engine().connect() as conn:
+                position = conn.execute(select(ReplicaHeartbeat.beat_at).where(
+                    ReplicaHeartbeat.name == HEARTBEAT_NAME
+                )).scalar()
+        except SQLAlchemyError as e:
+            self.mark_unavailable(e)
+            return False, None
+        with self._lock:
+            self._available, self._position, self._checked_at = True, position, time.monotonic()
+            self.last_error = None
+        return True, position
+
+    def route(self, owner_id):
+        """Get 'replica', or the reason from FALLBACK_REASONS the owner's read must use the primary"""
+        available, position = self._check()
+        with self._lock:
+            if not available:
+                reason = 'unavailable'
+            elif position is None or (datetime.now() - position).total_seconds() > self.max_lag:
+                reason = 'stale'
+            elif owner_id in self._last_write and position < self._last_write[owner_id]:
+                reason = 'read_your_writes'
+            else:
+                # The replica has caught up with the owner's writes
+                self._last_write.pop(owner_id, None)
+                self.replica_reads += 1
+                return 'replica'
+            self.primary_reads[reason] += 1
+            return reason
+
+    def session(self):
+        self._get_engine()
+        return self._sessions()
+
+    def stats(self):
+        with self._lock:
+            lag = (datetime.now() - self._position).total_seconds() if self._available and self._position else None
+            return {
+                'enabled': self.enabled,
+                'available': self._available,
+                'lag_seconds': round(lag, 1) if lag is not None else None,
+                'max_lag_seconds': self.max_lag,
+                'replica_reads': self.replica_reads,
+                'primary_reads': dict(self.primary_reads),
+                'owners_awaiting_replica': len(self._last_write),
+                'last_error': self.last_error
+            }
+
+# Process-wide router shared by every DataManager
+replica_router = ReplicaRouter()
+
+@contextmanager
+def read_session_scope(owner_id):
+    """Provide a short-lived session for the owner's reads, on the replica when it is fresh enough"""
+    if not replica_router.enabled or replica_router.route(owner_id) != 'replica':
+        with session_scope() as db:
+            yield db
+        return
+
+    db = replica_router.session()
+    try:
+        yield db
+    except (OperationalError, InterfaceError) as e:
+        replica_router.mark_unavailable(e)
+        raise
+    finally:
+        db.close()
+
+def sync_sqlite_replica():
+    """Copy the SQLite primary onto the SQLite replica, standing in for replication in local tests"""
+    primary, replica = make_url(DATABASE_URL), make_url(replica_router.url)
+    if primary.get_backend_name() != 'sqlite' or replica.get_backend_name() != 'sqlite':
+        raise Exception("sync only copies a SQLite primary to a SQLite replica")
+    # A fresh heartbeat first, so the copy is as current as the moment it was taken
+    replica_router.beat()
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the read replica or copy a local SQLite primary to it")
+    parser.add_argument("command", choices=["status", "sync"])
+    parser.add_argument("--every", type=float, default=0,
+                        help="With sync, keep copying every this many seconds")
+    args = parser.parse_args()
+
+    if not replica_router.enabled:
+        raise SystemExit("REPLICA_DATABASE_URL is not set")
+
+    if args.command == "status":
+        replica_router._check()
+        print(replica_router.stats())
+        return
+
+    while True:
+        sync_sqlite_replica()
+        print(f"Copied primary to replica at {datetime.now():%H:%M:%S}")
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
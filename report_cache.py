@@ -0,0 +1,87 @@
+"""Per-owner cache for report results.
+
+Entries are keyed on the owner, the owner's data version and the report call
+(method name and arguments). Writing data for an owner bumps that owner's
+version, which makes every cached report for the owner unreachable; stale
+entries then age out through LRU and TTL eviction.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', '512'))
+REPORT_CACHE_TTL = float(os.getenv('REPORT_CACHE_TTL', '600'))
+
+class ReportCache:
+    """Thread-safe LRU cache with a TTL and per-owner invalidation"""
+
+    def __init__(self, max_entries=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, owner_id, key):
+        """Look up a report.
+
+        Returns (found, value, version). Pass version back to set() so a result
+        computed while the owner was writing is never stored as current.
+        """
+        with self._lock:
+            version = self._versions.get(owner_id, 0)
+            entry_key = (owner_id, version, key)
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return True, value, version
+                del self._entries[entry_key]
+                self.evictions += 1
+            self.misses += 1
+            return False, None, version
+
+    def set(self, owner_id, key, version, value):
+        """Store a report computed at the given owner version"""
+        with self._lock:
+            if self._versions.get(owner_id, 0) != version:
+                return
+            self._entries[(owner_id, version, key)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((owner_id, version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_owner(self, owner_id):
+        """Discard every cached report for an owner after new data is committed"""
+        with self._lock:
+            self._versions[owner_id] = self._versions.get(owner_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl
+            }
+
+# Process-wide cache shared by every DataManager
+report_cache = ReportCache()
@@ -0,0 +1,327 @@
+"""Daily per-owner rollups that reports read instead of raw journeys and expenses.
+
+daily_owner_stats holds revenue, passenger, trip and expense totals per owner
+per day, daily_owner_expenses holds expense totals by type and
+daily_route_stats holds passenger, revenue and seat totals per origin and
+destination. All are updated in the same transaction as the writes that change them, so reports
+never see them out of step with the raw tables. The backfill command rebuilds
+them from history and then refreshes the weekly and monthly period views;
+--trips first groups journeys recorded without a trip into trips.
+
+Usage:
+    python rollups.py [--owner-email owner@example.com] [--start 2024-01-01] [--end 2024-12-31]
+    python rollups.py --trips
+"""
+import argparse
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import select, delete, insert, update, func, literal, union_all, bindparam
+from database import (
+    session_scope, User, Passenger, Journey, Expense, Trip, DailyOwnerStats, DailyOwnerExpense,
+    DailyRouteStats, DEFAULT_TRIP_CAPACITY
+)
+from sql_compat import upsert_insert
+from period_views import mark_stale, refresh_period_views
+
+def add_journey_stats(db, owner_id, day_totals, new_trips=0):
+    """Add journey totals to the daily rollup.
+
+    day_totals maps each day to (passengers, revenue). new_trips is the number
+    of trips recorded on each day (0 when the journeys joined existing trips),
+    or a dict of day to trips when days differ.
+    """
+    if not day_totals:
+        return
+
+    if isinstance(new_trips, dict):
+        trips_by_day = {day: new_trips.get(day, 0) for day in day_totals}
+    else:
+        trips_by_day = {day: new_trips for day in day_totals}
+
+    stmt = upsert_insert(db, DailyOwnerStats).values([{
+        'owner_id': owner_id,
+        'day': day,
+        'revenue': revenue,
+        'passenger_count': passengers,
+        'trip_count': trips_by_day[day],
+        'expenses': 0.0
+    } for day, (passengers, revenue) in day_totals.items()])
+    trip_count = DailyOwnerStats.trip_count + stmt.excluded.trip_count
+
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['owner_id', 'day'],
+        set_={
+            'revenue': DailyOwnerStats.revenue + stmt.excluded.revenue,
+            'passenger_count': DailyOwnerStats.passenger_count + stmt.excluded.passenger_count,
+            'trip_count': trip_count
+        }
+    ))
+    mark_stale(db, owner_id, min(day_totals))
+
+def add_expense_stats(db, owner_id, expenses):
+    """Add (day, expense_type, amount) entries to the daily rollups"""
+    if not expenses:
+        return
+
+    by_day = defaultdict(float)
+    by_type = defaultdict(float)
+    for day, expense_type, amount in expenses:
+        by_day[day] += amount
+        by_type[(day, expense_type)] += amount
+
+    stmt = upsert_insert(db, DailyOwnerStats).values([{
+        'owner_id': owner_id,
+        'day': day,
+        'revenue': 0.0,
+        'passenger_count': 0,
+        'trip_count': 0,
+        'expenses': amount
+    } for day, amount in by_day.items()])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['owner_id', 'day'],
+        set_={'expenses': DailyOwnerStats.expenses + stmt.excluded.expenses}
+    ))
+
+    stmt = upsert_insert(db, DailyOwnerExpense).values([{
+        'owner_id': owner_id,
+        'day': day,
+        'expense_type': expense_type,
+        'amount': amount
+    } for (day, expense_type), amount in by_type.items()])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['owner_id', 'day', 'expense_type'],
+        set_={'amount': DailyOwnerExpense.amount + stmt.excluded.amount}
+    ))
+    mark_stale(db, owner_id, min(by_day))
+
+def add_route_stats(db, owner_id, route_totals):
+    """Add totals to the route rollup.
+
+    route_totals maps (day, origin_id, destination_id) to (passengers, revenue,
+    trips, seats_offered, seats_sold, trip_revenue), the last two being the
+    seats and revenue added to trips.
+    """
+    if not route_totals:
+        return
+
+    stmt = upsert_insert(db, DailyRouteStats).values([{
+        'owner_id': owner_id,
+        'day': day,
+        'origin_id': origin_id,
+        'destination_id': destination_id,
+        'passenger_count': passengers,
+        'revenue': revenue,
+        'trip_count': trips,
+        'seats_offered': seats,
+        'seats_sold': sold,
+        'trip_revenue': trip_revenue
+    } for (day, origin_id, destination_id), (passengers, revenue, trips, seats, sold, trip_revenue)
+        in route_totals.items()])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['owner_id', 'day', 'origin_id', 'destination_id'],
+        set_={
+            'passenger_count': DailyRouteStats.passenger_count + stmt.excluded.passenger_count,
+            'revenue': DailyRouteStats.revenue + stmt.excluded.revenue,
+            'trip_count': DailyRouteStats.trip_count + stmt.excluded.trip_count,
+            'seats_offered': DailyRouteStats.seats_offered + stmt.excluded.seats_offered,
+            'seats_sold': DailyRouteStats.seats_sold + stmt.excluded.seats_sold,
+            'trip_revenue': DailyRouteStats.trip_revenue + stmt.excluded.trip_revenue
+        }
+    ))
+
+def _range_filters(owner_column, day_column, owner_id, start_date, end_date):
+    filters = []
+    if owner_id is not None:
+        filters.append(owner_column == owner_id)
+    if start_date is not None:
+        filters.append(day_column >= start_date)
+    if end_date is not None:
+        filters.append(day_column <= end_date)
+    return filters
+
+def rebuild_daily_stats(db, owner_id=None, start_date=None, end_date=None):
+    """Rebuild the daily rollups from trips, raw journeys and expenses.
+
+    Every filter is optional. Trips are counted from the trips table; every
+    journey belongs to one (see backfill_trips for older journeys that don't).
+    """
+    db.execute(delete(DailyOwnerStats).where(*_range_filters(
+        DailyOwnerStats.owner_id, DailyOwnerStats.day, owner_id, start_date, end_date)))
+    db.execute(delete(DailyOwnerExpense).where(*_range_filters(
+        DailyOwnerExpense.owner_id, DailyOwnerExpense.day, owner_id, start_date, end_date)))
+    db.execute(delete(DailyRouteStats).where(*_range_filters(
+        DailyRouteStats.owner_id, DailyRouteStats.day, owner_id, start_date, end_date)))
+
+    journey_part = select(
+        Passenger.owner_id.label('owner_id'),
+        Journey.journey_date.label('day'),
+        func.sum(Journey.fare).label('revenue'),
+        func.count(Journey.id).label('passenger_count'),
+        literal(0).label('trip_count'),
+        literal(0.0).label('expenses')
+    ).select_from(Journey).join(Passenger).where(*_range_filters(
+        Passenger.owner_id, Journey.journey_date, owner_id, start_date, end_date
+    )).group_by(Passenger.owner_id, Journey.journey_date)
+
+    trip_part = select(
+        Trip.owner_id.label('owner_id'),
+        Trip.trip_date.label('day'),
+        literal(0.0).label('revenue'),
+        literal(0).label('passenger_count'),
+        func.count(Trip.id).label('trip_count'),
+        literal(0.0).label('expenses')
+    ).where(*_range_filters(
+        Trip.owner_id, Trip.trip_date, owner_id, start_date, end_date
+    )).group_by(Trip.owner_id, Trip.trip_date)
+
+    expense_filters = _range_filters(Expense.owner_id, Expense.date, owner_id, start_date, end_date)
+    expense_part = select(
+        Expense.owner_id.label('owner_id'),
+        Expense.date.label('day'),
+        literal(0.0).label('revenue'),
+        literal(0).label('passenger_count'),
+        literal(0).label('trip_count'),
+        func.sum(Expense.amount).label('expenses')
+    ).where(*expense_filters).group_by(Expense.owner_id, Expense.date)
+
+    parts = union_all(journey_part, trip_part, expense_part).subquery()
+    columns = ['owner_id', 'day', 'revenue', 'passenger_count', 'trip_count', 'expenses']
+    db.execute(insert(DailyOwnerStats).from_select(columns, select(
+        parts.c.owner_id,
+        parts.c.day,
+        func.sum(parts.c.revenue),
+        func.sum(parts.c.passenger_count),
+        func.sum(parts.c.trip_count),
+        func.sum(parts.c.expenses)
+    ).group_by(parts.c.owner_id, parts.c.day)))
+
+    db.execute(insert(DailyOwnerExpense).from_select(
+        ['owner_id', 'day', 'expense_type', 'amount'],
+        select(
+            Expense.owner_id,
+            Expense.date,
+            Expense.expense_type,
+            func.sum(Expense.amount)
+        ).where(*expense_filters).group_by(Expense.owner_id, Expense.date, Expense.expense_type)
+    ))
+
+    route_journeys = select(
+        Passenger.owner_id.label('owner_id'),
+        Journey.journey_date.label('day'),
+        Journey.origin_id.label('origin_id'),
+        Journey.destination_id.label('destination_id'),
+        func.count(Journey.id).label('passenger_count'),
+        func.sum(Journey.fare).label('revenue'),
+        literal(0).label('trip_count'),
+        literal(0).label('seats_offered'),
+        literal(0).label('seats_sold'),
+        literal(0.0).label('trip_revenue')
+    ).select_from(Journey).join(Passenger).where(*_range_filters(
+        Passenger.owner_id, Journey.journey_date, owner_id, start_date, end_date
+    )).group_by(Passenger.owner_id, Journey.journey_date, Journey.origin_id, Journey.destination_id)
+
+    route_trips = select(
+        Trip.owner_id.label('owner_id'),
+        Trip.trip_date.label('day'),
+        Trip.origin_id.label('origin_id'),
+        Trip.destination_id.label('destination_id'),
+        literal(0).label('passenger_count'),
+        literal(0.0).label('revenue'),
+        func.count(Trip.id).label('trip_count'),
+        func.sum(Trip.capacity).label('seats_offered'),
+        func.sum(Trip.seats_sold).label('seats_sold'),
+        func.sum(Trip.revenue).label('trip_revenue')
+    ).where(*_range_filters(
+        Trip.owner_id, Trip.trip_date, owner_id, start_date, end_date
+    )).group_by(Trip.owner_id, Trip.trip_date, Trip.origin_id, Trip.destination_id)
+
+    routes = union_all(route_journeys, route_trips).subquery()
+    db.execute(insert(DailyRouteStats).from_select(
+        ['owner_id', 'day', 'origin_id', 'destination_id', 'passenger_count', 'revenue',
+         'trip_count', 'seats_offered', 'seats_sold', 'trip_revenue'],
+        select(
+            routes.c.owner_id,
+            routes.c.day,
+            routes.c.origin_id,
+            routes.c.destination_id,
+            func.sum(routes.c.passenger_count),
+            func.sum(routes.c.revenue),
+            func.sum(routes.c.trip_count),
+            func.sum(routes.c.seats_offered),
+            func.sum(routes.c.seats_sold),
+            func.sum(routes.c.trip_revenue)
+        ).group_by(routes.c.owner_id, routes.c.day, routes.c.origin_id, routes.c.destination_id)
+    ))
+
+    # Rebuilt days may fall in closed periods the period views already hold
+    owner_ids = [owner_id] if owner_id is not None else db.execute(select(User.id)).scalars().all()
+    for owner in owner_ids:
+        mark_stale(db, owner, start_date or date.min)
+
+def backfill_trips(db, owner_id=None, capacity=DEFAULT_TRIP_CAPACITY, batch_size=5000):
+    """Group journeys recorded without a trip into trips.
+
+    Journeys of one owner on the same day, route and fare are taken to be the
+    same run, split into trips of at most ``capacity`` passengers in id order.
+    Journeys are read batch_size at a time. Returns the number of trips created.
+    """
+    query = select(
+        Journey.id, Passenger.owner_id, Journey.journey_date, Journey.origin_id,
+        Journey.destination_id, Journey.fare
+    ).join(Passenger).where(Journey.trip_id.is_(None)).order_by(
+        Passenger.owner_id, Journey.journey_date, Journey.origin_id,
+        Journey.destination_id, Journey.fare, Journey.id
+    )
+    if owner_id is not None:
+        query = query.where(Passenger.owner_id == owner_id)
+    # A batch always holds at least one full trip, so every pass makes progress
+    batch_size = max(batch_size, capacity)
+
+    created = 0
+    while True:
+        # Journeys leave the query once they have a trip, so each pass reads the next batch
+        rows = db.execute(query.limit(batch_size)).all()
+        if not rows:
+            return created
+        trips = []
+        for row in rows:
+            key = (row.owner_id, row.journey_date, row.origin_id, row.destination_id, row.fare)
+            if not trips or trips[-1][0] != key or len(trips[-1][1]) >= capacity:
+                trips.append((key, []))
+            trips[-1][1].append(row.id)
+        if len(rows) == batch_size and len(trips[-1][1]) < capacity:
+            # The last run may continue in the next batch; leave it to fill its trip there
+            trips.pop()
+
+        trip_ids = db.execute(insert(Trip).returning(Trip.id, sort_by_parameter_order=True), [{
+            'owner_id': owner, 'trip_date': day, 'origin_id': origin_id, 'destination_id': destination_id,
+            'fare': fare, 'capacity': capacity, 'seats_sold': len(ids), 'revenue': fare * len(ids)
+        } for (owner, day, origin_id, destination_id, fare), ids in trips]).scalars().all()
+        db.execute(
+            update(Journey.__table__).where(Journey.__table__.c.id == bindparam('journey_id')),
+            [{'journey_id': jid, 'trip_id': trip_id}
+             for trip_id, (_, ids) in zip(trip_ids, trips) for jid in ids]
+        )
+        created += len(trips)
+
+def main():
+    from importer import owner_id_for_email
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily owner rollups from history")
+    parser.add_argument("--owner-email", help="Only rebuild this owner's rollups")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--trips", action="store_true",
+                        help="Group journeys recorded without a trip into trips first")
+    args = parser.parse_args()
+
+    owner_id = owner_id_for_email(args.owner_email) if args.owner_email else None
+    with session_scope() as db:
+        if args.trips:
+            print(f"Created {backfill_trips(db, owner_id)} trips")
+        rebuild_daily_stats(db, owner_id, args.start, args.end)
+    refresh_period_views()
+    print("Daily rollups and period views rebuilt")
+
+if __name__ == "__main__":
+    main()
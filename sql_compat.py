@@ -0,0 +1,52 @@
+"""Dialect-neutral SQL constructs.
+
+Everything that differs between Postgres and the embedded SQLite backend is
+expressed here, so DataManager queries compile to equivalent SQL and return
+identical results on both.
+"""
+from sqlalchemy import Date
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+class week_start(FunctionElement):
+    """The Monday on or before a date"""
+    type = Date()
+    name = 'week_start'
+    inherit_cache = True
+
+class month_start(FunctionElement):
+    """The first day of a date's month"""
+    type = Date()
+    name = 'month_start'
+    inherit_cache = True
+
+@compiles(week_start, 'postgresql')
+def _pg_week_start(element, compiler, **kw):
+    return f"CAST(date_trunc('week', {compiler.process(element.clauses, **kw)}) AS DATE)"
+
+@compiles(month_start, 'postgresql')
+def _pg_month_start(element, compiler, **kw):
+    return f"CAST(date_trunc('month', {compiler.process(element.clauses, **kw)}) AS DATE)"
+
+@compiles(week_start, 'sqlite')
+def _sqlite_week_start(element, compiler, **kw):
+    # strftime('%w') counts from Sunday = 0; shift so weeks start on Monday like date_trunc
+    column = compiler.process(element.clauses, **kw)
+    return (f"date({column}, '-' || ((CAST(strftime('%w', {column}) AS INTEGER) + 6) % 7) "
+            f"|| ' days')")
+
+@compiles(month_start, 'sqlite')
+def _sqlite_month_start(element, compiler, **kw):
+    return f"date({compiler.process(element.clauses, **kw)}, 'start of month')"
+
+def period_bucket(period_type):
+    """Get the construct that truncates a date to the start of its week or month"""
+    return week_start if period_type == 'Weekly' else month_start
+
+def upsert_insert(db, model):
+    """Get an INSERT for model that supports ON CONFLICT on the session's database"""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
@@ -0,0 +1,66 @@
+"""Cold-start import timing for the modules each page of app.py loads.
+
+Every entry is imported in a fresh interpreter with `python -X importtime`, so
+the numbers are what a new Streamlit process pays the first time it renders
+that page. The heaviest packages behind each entry are listed to show where
+the time goes.
+
+Usage:
+    python startup_report.py [--top 8]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# (label, modules the page imports on top of streamlit)
+ENTRY_POINTS = [
+    ('streamlit', ['streamlit']),
+    ('login page', ['streamlit', 'auth_manager', 'utils', 'report_cache', 'instrumentation']),
+    ('password check', ['passwords']),
+    ('google sign-in', ['google_certs']),
+    ('journey entry page', ['data_manager']),
+    ('financial reports page', ['data_manager', 'plotly.express']),
+    ('import & export page', ['importer', 'exporter']),
+]
+
+def import_times(modules):
+    """Get (total_ms, [(package, cumulative_ms)]) for importing modules in a fresh interpreter.
+
+    Packages are top-level names at any depth, so a package pulled in by one of
+    our modules is listed alongside it.
+    """
+    code = '; '.join(f'import {m}' for m in modules)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    total_ms = 0.0
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        ms = int(cumulative) / 1000
+        # Entries with one leading space are top-level; nested ones are part of their parent's time
+        if not name.startswith('  '):
+            total_ms += ms
+        package = name.strip()
+        if '.' not in package and not package.startswith('_'):
+            packages[package] = max(ms, packages.get(package, 0.0))
+    return total_ms, list(packages.items())
+
+def main():
+    parser = argparse.ArgumentParser(description="Report cold-start import time per app page")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages to list per entry")
+    args = parser.parse_args()
+
+    for label, modules in ENTRY_POINTS:
+        total_ms, packages = import_times(modules)
+        print(f"{label:<24} {total_ms:>9.1f} ms  ({', '.join(modules)})")
+        for name, ms in sorted(packages, key=lambda p: p[1], reverse=True)[:args.top]:
+            print(f"    {name:<40} {ms:>9.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway SQLite database before any module creates the engine
+_db_dir = tempfile.mkdtemp(prefix='matrack-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('MATRACK_JOURNAL_DIR', os.path.join(_db_dir, 'journal'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture(scope='session')
+def schema():
+    from migrations import upgrade
+
+    upgrade()
+
+@pytest.fixture
+def owner_id(schema):
+    """A new owner per test, so tests don't see each other's rows"""
+    import uuid
+    from database import session_scope, User
+
+    with session_scope() as db:
+        user = User(email=f"{uuid.uuid4().hex}@example.com", name='Test Owner', is_google_auth=False)
+        db.add(user)
+        db.flush()
+        return user.id
@@ -0,0 +1,36 @@
+import io
+from sqlalchemy import select, func
+from database import session_scope, Expense, Journey, Passenger
+from importer import import_journeys, import_expenses
+
+def test_import_rejects_amounts_that_are_not_finite(owner_id):
+    source = io.StringIO(
+        "expense_type,amount,date,notes\n"
+        "Fuel,100,2025-01-01,\n"
+        "Fuel,nan,2025-01-02,\n"
+        "Fuel,inf,2025-01-03,\n"
+        "Fuel,-inf,2025-01-04,\n"
+    )
+    result = import_expenses(source, owner_id)
+
+    assert result['rows_imported'] == 1
+    assert [line for line, _ in result['errors']] == [3, 4, 5]
+    with session_scope() as db:
+        amounts = db.execute(select(Expense.amount).where(Expense.owner_id == owner_id)).scalars().all()
+    assert amounts == [100.0]
+
+def test_import_rejects_nan_fares(owner_id):
+    source = io.StringIO(
+        "name,phone,origin,destination,fare,journey_date\n"
+        "Ann,0712000001,Nairobi,Kisii,100,2025-01-01\n"
+        "Bob,0712000002,Nairobi,Kisii,NaN,2025-01-01\n"
+    )
+    result = import_journeys(source, owner_id)
+
+    assert result['rows_imported'] == 1
+    assert len(result['errors']) == 1
+    with session_scope() as db:
+        count = db.execute(select(func.count(Journey.id)).join(Passenger).where(
+            Passenger.owner_id == owner_id
+        )).scalar()
+    assert count == 1
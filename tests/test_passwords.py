@@ -0,0 +1,45 @@
+import threading
+import time
+import pytest
+import passwords
+from passwords import LoginThrottle, HashingBusy
+
+def test_concurrent_attempts_cannot_pass_the_limit():
+    throttle = LoginThrottle(max_attempts=3, window=60)
+    barrier = threading.Barrier(20)
+    allowed = []
+
+    def attempt():
+        barrier.wait()
+        retry_after, _ = throttle.reserve('owner@example.com')
+        allowed.append(retry_after == 0)
+
+    threads = [threading.Thread(target=attempt) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(allowed) == 3
+
+def test_released_and_reset_attempts_do_not_count():
+    throttle = LoginThrottle(max_attempts=2, window=60)
+    _, attempt = throttle.reserve('Owner@example.com ')
+    throttle.release('owner@example.com', attempt)
+    throttle.reserve('owner@example.com')
+    throttle.reserve('owner@example.com')
+    assert throttle.reserve('owner@example.com')[0] > 0
+    throttle.reset('owner@example.com')
+    assert throttle.reserve('owner@example.com')[0] == 0
+
+def test_tracked_emails_are_bounded():
+    throttle = LoginThrottle(max_attempts=1, window=60, max_tracked=100)
+    for n in range(1000):
+        throttle.reserve(f"guess{n}@example.com")
+    assert len(throttle._failures) == 100
+    # The most recent emails are still throttled
+    assert throttle.reserve('guess999@example.com')[0] > 0
+
+def test_hash_timeout_is_reported_as_busy(monkeypatch):
+    monkeypatch.setattr(passwords, 'BCRYPT_TIMEOUT', 0.05)
+    with pytest.raises(HashingBusy, match="try again"):
+        passwords._run(time.sleep, 0.5)
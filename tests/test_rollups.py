@@ -0,0 +1,62 @@
+from datetime import date
+from sqlalchemy import select, insert, func
+from database import session_scope, Journey, Trip, DailyOwnerStats, DailyRouteStats, DEFAULT_TRIP_CAPACITY
+from passengers import passenger_ids
+from places import place_ids
+from rollups import backfill_trips, rebuild_daily_stats
+
+def test_backfill_groups_untripped_journeys_across_batches(owner_id):
+    day = date(2025, 2, 1)
+    with session_scope() as db:
+        ids_by_place = place_ids(db, ['Nairobi', 'Kisii'])
+        passenger_id = passenger_ids(db, owner_id, [{'name': 'Ann', 'phone': '0712000001'}])['0712000001']
+        # Seven journeys on one fare and two on another, none of them on a trip
+        db.execute(insert(Journey), [{
+            'passenger_id': passenger_id, 'trip_id': None, 'origin_id': ids_by_place['Nairobi'],
+            'destination_id': ids_by_place['Kisii'], 'fare': fare, 'journey_date': day
+        } for fare in [100.0] * 7 + [150.0] * 2])
+
+        # Batches of three cut the first run mid-trip; it must still fill whole trips
+        assert backfill_trips(db, owner_id, capacity=3, batch_size=2) == 4
+        rebuild_daily_stats(db, owner_id)
+
+    with session_scope() as db:
+        trips = db.execute(select(Trip.fare, Trip.seats_sold, func.count(Journey.id)).join(
+            Journey, Journey.trip_id == Trip.id
+        ).where(Trip.owner_id == owner_id).group_by(Trip.id).order_by(Trip.fare, Trip.seats_sold.desc())).all()
+        untripped = db.execute(select(func.count(Journey.id)).where(
+            Journey.passenger_id == passenger_id, Journey.trip_id.is_(None)
+        )).scalar()
+        trip_count = db.execute(select(DailyOwnerStats.trip_count).where(
+            DailyOwnerStats.owner_id == owner_id, DailyOwnerStats.day == day
+        )).scalar()
+
+    assert [tuple(t) for t in trips] == [(100.0, 3, 3), (100.0, 3, 3), (100.0, 1, 1), (150.0, 2, 2)]
+    assert untripped == 0
+    assert trip_count == 4
+
+def test_route_matrix_divides_trip_sales_by_trip_seats(owner_id):
+    from data_manager import DataManager
+
+    day = date(2025, 3, 1)
+    dm = DataManager(owner_id)
+    trip_id = dm.add_trip(day, 'Nairobi', 'Kisii', 100.0, [
+        {'name': 'Ann', 'phone': '0712000001'}, {'name': 'Bob', 'phone': '0712000002'}
+    ], capacity=4)
+    dm.add_passenger_journey('Cy', '0712000003', 'Nairobi', 'Kisii', 100.0, day, trip_id)
+    # Entered on its own, the journey gets a trip of its own with the default seats
+    dm.add_passenger_journey('Di', '0712000004', 'Nairobi', 'Kisii', 200.0, day)
+
+    route = dm.get_route_matrix(day, day).iloc[0]
+    seats = 4 + DEFAULT_TRIP_CAPACITY
+    assert (route['trips'], route['seats_offered'], route['seats_sold']) == (2, seats, 4)
+    assert route['revenue_per_seat'] == round(500.0 / seats, 2)
+    assert route['load_factor'] == round(4 / seats, 3)
+
+    with session_scope() as db:
+        written = db.execute(select(DailyRouteStats).where(DailyRouteStats.owner_id == owner_id)).scalars().one()
+        written = (written.trip_count, written.seats_offered, written.seats_sold, written.trip_revenue)
+        rebuild_daily_stats(db, owner_id)
+    with session_scope() as db:
+        rebuilt = db.execute(select(DailyRouteStats).where(DailyRouteStats.owner_id == owner_id)).scalars().one()
+        assert (rebuilt.trip_count, rebuilt.seats_offered, rebuilt.seats_sold, rebuilt.trip_revenue) == written
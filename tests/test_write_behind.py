@@ -0,0 +1,41 @@
+from datetime import date
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+import write_behind
+from database import session_scope, Expense
+from write_behind import WriteJournal, WriteBehindQueue
+
+def test_batch_retried_after_a_transient_error_applies_each_entry_once(owner_id, tmp_path, monkeypatch):
+    from data_manager import record_expense
+
+    journal = WriteJournal(str(tmp_path))
+    for amount in (10.0, 20.0, 30.0, 40.0):
+        journal.append({
+            'key': f"{owner_id}-{amount}",
+            'operation': 'add_expense',
+            'owner_id': owner_id,
+            'arguments': {'expense_type': 'Fuel', 'amount': amount, 'date': date(2025, 4, 1), 'notes': None},
+            'queued_at': '2025-04-01T08:00:00'
+        })
+
+    # The third entry loses the database once, after the first two were applied in the batch
+    calls = []
+    def flaky_record_expense(db, owner, **arguments):
+        calls.append(arguments['amount'])
+        if len(calls) == 3:
+            raise OperationalError("INSERT INTO expenses", {}, Exception("database is locked"))
+        record_expense(db, owner, **arguments)
+    monkeypatch.setattr(write_behind, '_operations', lambda: {'add_expense': flaky_record_expense})
+
+    queue = WriteBehindQueue(str(tmp_path))
+    with pytest.raises(OperationalError):
+        queue.flush()
+    assert queue.flush() == 4
+
+    with session_scope() as db:
+        amounts = db.execute(select(Expense.amount).where(
+            Expense.owner_id == owner_id
+        ).order_by(Expense.amount)).scalars().all()
+    assert amounts == [10.0, 20.0, 30.0, 40.0]
+    assert queue.pending() == 0
@@ -0,0 +1,319 @@
+"""Optional write-behind queue for trip, journey and expense entry.
+
+With MATRACK_WRITE_BEHIND enabled, the entry pages append each write to a
+local journal file and return as soon as it is fsynced, instead of waiting on
+a database commit. A background worker applies journaled writes in order, in
+batches of up to MATRACK_JOURNAL_BATCH per transaction, and checkpoints its
+position in the journal after each commit. While the database is unreachable
+the worker retries the same batch with backoff, so a short outage delays
+writes instead of losing them, and a restart resumes from the checkpoint.
+
+Every entry carries an idempotency key that is stored in applied_writes in
+the same transaction as the write, so an entry replayed after a crash between
+commit and checkpoint is skipped. Entries the database rejects for good (for
+example a trip that has filled up) are moved to failed.jsonl with the error.
+
+One app process owns a journal directory.
+
+Usage:
+    python write_behind.py [--journal-dir matrack_journal]
+"""
+import argparse
+import gc
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, time as time_of_day
+from sqlalchemy import select, delete
+from sqlalchemy.exc import OperationalError, InterfaceError, TimeoutError as PoolTimeoutError
+from database import session_scope, AppliedWrite
+from report_cache import report_cache
+from read_replica import replica_router
+
+WRITE_BEHIND_ENABLED = os.getenv('MATRACK_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+JOURNAL_DIR = os.getenv('MATRACK_JOURNAL_DIR', 'matrack_journal')
+JOURNAL_BATCH = int(os.getenv('MATRACK_JOURNAL_BATCH', '100'))
+JOURNAL_FLUSH_SECONDS = float(os.getenv('MATRACK_JOURNAL_FLUSH_SECONDS', '0.5'))
+JOURNAL_MAX_BACKOFF = float(os.getenv('MATRACK_JOURNAL_MAX_BACKOFF', '30'))
+# Applied keys are only needed until the checkpoint passes them; older ones are pruned
+APPLIED_KEY_RETENTION = timedelta(days=1)
+
+# Errors that mean the database could not be reached, as opposed to a rejected write
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
+def _encode(value):
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, time_of_day):
+        return {'$time': value.isoformat()}
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+def _decode(obj):
+    if '$date' in obj:
+        return date.fromisoformat(obj['$date'])
+    if '$time' in obj:
+        return time_of_day.fromisoformat(obj['$time'])
+    return obj
+
+def _operations():
+    from data_manager import record_trip, record_passenger_journey, record_expense
+
+    return {
+        'add_trip': record_trip,
+        'add_passenger_journey': record_passenger_journey,
+        'add_expense': record_expense,
+    }
+
+OPERATIONS = ('add_trip', 'add_passenger_journey', 'add_expense')
+
+class WriteJournal:
+    """Append-only journal of pending writes with a durable read checkpoint"""
+
+    def __init__(self, directory=JOURNAL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'journal.jsonl')
+        self.checkpoint_path = os.path.join(directory, 'checkpoint')
+        self.failed_path = os.path.join(directory, 'failed.jsonl')
+        self._lock = threading.Lock()
+
+        with open(self.path, 'ab+') as journal:
+            # An entry cut short by a crash was never acknowledged; drop it
+            size = journal.seek(0, os.SEEK_END)
+            if size:
+                journal.seek(0)
+                end = journal.read().rfind(b'\n') + 1
+                if end != size:
+                    journal.truncate(end)
+        self._offset = min(self._read_checkpoint(), os.path.getsize(self.path))
+        self._pending = sum(1 for _ in self._lines(self._offset))
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_checkpoint(self, offset):
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as checkpoint:
+            checkpoint.write(str(offset))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _lines(self, offset, limit=None):
+        with open(self.path, 'rb') as journal:
+            journal.seek(offset)
+            count = 0
+            while limit is None or count < limit:
+                line = journal.readline()
+                if not line.endswith(b'\n'):
+                    return
+                offset += len(line)
+                count += 1
+                yield offset, line
+
+    def append(self, entry):
+        """Durably append an entry; returns once it is on disk"""
+        line = json.dumps(entry, default=_encode).encode() + b'\n'
+        with self._lock:
+            with open(self.path, 'ab') as journal:
+                journal.write(line)
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._pending += 1
+
+    def read_batch(self, limit):
+        """Get (end offset, entries) for up to limit entries after the checkpoint"""
+        with self._lock:
+            offset = self._offset
+        entries = []
+        for offset, line in self._lines(offset, limit):
+            entries.append(json.loads(line, object_hook=_decode))
+        return offset, entries
+
+    def advance(self, offset, count):
+        """Move the checkpoint past applied entries, emptying the journal once all are applied"""
+        with self._lock:
+            self._pending -= count
+            if offset == os.path.getsize(self.path):
+                # Nothing appended since the batch was read. The checkpoint is reset
+                # first: a crash in between replays entries the applied keys then skip
+                self._write_checkpoint(0)
+                with open(self.path, 'r+b') as journal:
+                    journal.truncate(0)
+                offset = 0
+            else:
+                self._write_checkpoint(offset)
+            self._offset = offset
+
+    def record_failure(self, entry, error):
+        with self._lock:
+            with open(self.failed_path, 'a') as failed:
+                failed.write(json.dumps({**entry, 'error': error}, default=_encode) + '\n')
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+class WriteBehindQueue:
+    """Journaled writes applied in order by a background worker"""
+
+    def __init__(self, directory=JOURNAL_DIR, batch_size=JOURNAL_BATCH, interval=JOURNAL_FLUSH_SECONDS):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.interval = interval
+        self._journal = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        # Held while a batch is read, applied and checkpointed, so a manual flush
+        # and the worker never apply the same batch side by side
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.applied = 0
+        self.skipped = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_error = None
+
+    def _get_journal(self):
+        with self._lock:
+            if self._journal is None:
+                self._journal = WriteJournal(self.directory)
+            return self._journal
+
+    def start(self):
+        """Start the worker once per process"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def submit(self, operation, owner_id, key=None, **arguments):
+        """Journal a DataManager write for the owner and return its idempotency key"""
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown write operation {operation}")
+        key = key or uuid.uuid4().hex
+        self._get_journal().append({
+            'key': key,
+            'operation': operation,
+            'owner_id': owner_id,
+            'arguments': arguments,
+            'queued_at': datetime.now().isoformat(timespec='seconds')
+        })
+        self.start()
+        self._wake.set()
+        return key
+
+    def pending(self):
+        return self._get_journal().pending()
+
+    def flush_batch(self):
+        """Apply the next batch in one transaction; returns the number of entries consumed.
+
+        Raises one of TRANSIENT_ERRORS if the database could not be reached,
+        leaving the batch to be retried.
+        """
+        with self._flush_lock:
+            return self._apply_batch(self._get_journal())
+
+    def _apply_batch(self, journal):
+        offset, entries = journal.read_batch(self.batch_size)
+        if not entries:
+            return 0
+
+        operations = _operations()
+        applied, skipped, failures = [], 0, []
+        with session_scope() as db:
+            keys = [e['key'] for e in entries]
+            done = set(db.execute(select(AppliedWrite.key).where(AppliedWrite.key.in_(keys))).scalars())
+            now = datetime.now()
+            for entry in entries:
+                if entry['key'] in done:
+                    skipped += 1
+                    continue
+                try:
+                    # A savepoint per entry, so one rejected write doesn't undo the batch
+                    with db.begin_nested():
+                        operations[entry['operation']](db, entry['owner_id'], **entry['arguments'])
+                    applied.append(entry)
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception as e:
+                    failures.append((entry, str(e)))
+                db.add(AppliedWrite(key=entry['key'], applied_at=now))
+                done.add(entry['key'])
+            db.execute(delete(AppliedWrite).where(AppliedWrite.applied_at < now - APPLIED_KEY_RETENTION))
+
+        for entry, error in failures:
+            journal.record_failure(entry, error)
+        journal.advance(offset, len(entries))
+        for owner_id in {e['owner_id'] for e in applied}:
+            replica_router.record_write(owner_id)
+            report_cache.invalidate_owner(owner_id)
+        with self._lock:
+            self.applied += len(applied)
+            self.skipped += skipped
+            self.failed += len(failures)
+            self.last_error = failures[-1][1] if failures else self.last_error
+        return len(entries)
+
+    def flush(self):
+        """Apply every journaled write now; returns the number of entries consumed"""
+        total = 0
+        while True:
+            count = self.flush_batch()
+            if not count:
+                return total
+            total += count
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                backoff = self.interval
+            except Exception as e:
+                with self._lock:
+                    self.retries += 1
+                    self.last_error = str(e)
+                del e
+                # Free the failed attempt's cursors now: an unfinalized SQLite
+                # statement keeps its connection's lock until it is collected
+                gc.collect()
+                # The batch stays at the head of the journal, so order is kept across retries
+                time.sleep(backoff)
+                backoff = min(backoff * 2, JOURNAL_MAX_BACKOFF)
+                self._wake.set()
+
+    def stats(self):
+        pending = self.pending()
+        with self._lock:
+            return {
+                'enabled': WRITE_BEHIND_ENABLED,
+                'pending': pending,
+                'applied': self.applied,
+                'skipped_duplicates': self.skipped,
+                'failed': self.failed,
+                'retries': self.retries,
+                'last_error': self.last_error
+            }
+
+# Process-wide queue used by the entry pages
+write_queue = WriteBehindQueue()
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply journaled writes to the database")
+    parser.add_argument("--journal-dir", default=JOURNAL_DIR)
+    args = parser.parse_args()
+
+    queue = WriteBehindQueue(args.journal_dir)
+    print(f"Applied {queue.flush()} journaled writes ({queue.failed} failed, see failed.jsonl)")
+
+if __name__ == "__main__":
+    main()